@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Dictionary benchmark.
+
+# File: bench_dictionary.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: compare the letter bucketing of create_page_dictionary
+# before the word index with the letter index lookups done by the theme.
+# The index itself is persisted by the store; building it from scratch
+# is timed apart. Usage:
+#   python3 benchmarks/bench_dictionary.py [sizes...]
+"""
+
+import os
+import sys
+import time
+import random
+import string
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'deutschkurs', 'logic'))
+
+from wordindex import WordIndex, dictionary_record
+
+SIZES = [10000, 50000, 100000]
+LETTERS = string.ascii_lowercase + 'äöü'
+
+
+def make_words(n, seed=0):
+    rnd = random.Random(seed)
+    words = {}
+    while len(words) < n:
+        word = ''.join(rnd.choice(LETTERS) for i in range(rnd.randint(3, 12)))
+        words[word] = {'title': word.title(), 'article': 'das', 'part_of_speech': 'Noun', 'topic': ['grundschule']}
+    return words
+
+
+def legacy(words):
+    """Letter bucketing as done before the single pass index"""
+    letters = set()
+    for word in words:
+        letters.add(word[0].upper())
+    pages = {}
+    for letter in letters:
+        dictionary = {}
+        for word in words:
+            wfl = word[0].upper()
+            if wfl == letter:
+                try:
+                    bucket = dictionary[letter]
+                    bucket.append(word)
+                    dictionary[letter] = sorted(bucket)
+                except:
+                    dictionary[letter] = [word]
+        pages[letter] = dictionary[letter]
+    return pages
+
+
+def build_index(words):
+    index = WordIndex()
+    index.rebuild(words)
+    return index
+
+
+def current(words, index):
+    """Letter pages as built by create_page_dictionary from the index"""
+    pages = {}
+    for letter in index.terms('letter'):
+        pages[letter] = [dictionary_record(word, words[word]) for word in sorted(index.words('letter', letter))]
+    return pages
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    value = func(*args)
+    return time.perf_counter() - start, value
+
+
+def main(sizes):
+    print("%10s %12s %12s %12s %9s" % ('words', 'legacy (s)', 'index (s)', 'current (s)', 'speedup'))
+    for size in sizes:
+        words = make_words(size)
+        told, pages = timeit(legacy, words)
+        tindex, index = timeit(build_index, words)
+        tnew, records = timeit(current, words, index)
+        assert sorted(pages) == sorted(records)
+        print("%10d %12.3f %12.3f %12.3f %8.1fx" % (size, told, tindex, tnew, told / tnew))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main([int(size) for size in sys.argv[1:]])
+    else:
+        main(SIZES)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Theme benchmark.
+
+# File: bench_theme.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: time the deutschkurs theme phases over a synthetic corpus,
+# offline (spaCy and Duden are replaced by stubs). kb4it, mako and nltk
+# (with the punkt tokenizer) must be installed. Usage:
+#   python3 benchmarks/bench_theme.py -topics 4 -files 50 -words 500
+#   python3 benchmarks/bench_theme.py -output baseline.json
+#   python3 benchmarks/bench_theme.py -compare baseline.json -threshold 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+DIR_BENCH = os.path.dirname(os.path.abspath(__file__))
+DIR_THEME = os.path.join(DIR_BENCH, '..', 'deutschkurs')
+sys.path.insert(0, os.path.join(DIR_THEME, 'logic'))
+
+import stubs
+
+PHASES = ['analyze_userdata', 'analyze_userdata_noop', 'create_stats',
+          'create_page_word', 'create_page_word_noop', 'create_page_dictionary', 'build']
+
+
+class FakeApp:
+    """The parts of the kb4it application used by the theme"""
+
+    def __init__(self, root, settings):
+        self.root = root
+        self.settings = settings
+
+    def get_source_path(self):
+        return self.root
+
+    def get_theme_properties(self):
+        return self.settings
+
+
+def make_theme(root, settings):
+    import theme
+    import language
+    from metrics import Metrics
+
+    language.POS_LABELS.update(stubs.POS_LABELS)
+
+    class BenchTheme(theme.Theme):
+        """Theme writing its pages to a local directory"""
+
+        def __init__(self):
+            self.log = logging.getLogger('bench')
+            self.srvapp = FakeApp(root, settings)
+            self.nlp = stubs.StubNlp()
+            self.metrics = Metrics()
+            self.pages = os.path.join(root, 'pages')
+            os.makedirs(self.pages, exist_ok=True)
+
+        def distribute(self, name, content):
+            with open(os.path.join(self.pages, "%s.adoc" % name), 'w') as fout:
+                fout.write(content)
+
+        def create_tagcloud_from_key(self, key):
+            return ''
+
+        # Pages provided by kb4it
+        def create_page_about_theme(self):
+            pass
+
+        def create_page_about_kb4it(self):
+            pass
+
+        def create_page_help(self):
+            pass
+
+    # Fresh class level state for every run
+    theme.Theme.envvars = {}
+    theme.Theme.cache = {}
+    theme.Theme.stats = {}
+    BenchTheme.store = None
+    return BenchTheme()
+
+
+def measure(results, phase, func, *args):
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    value = func(*args)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    results[phase] = {'seconds': elapsed, 'peak_kb': peak // 1024}
+    return value
+
+
+def write_pages(theme):
+    for word in theme.cache['words']:
+        theme.create_page_word(word)
+
+
+def run_once(params):
+    root = tempfile.mkdtemp(prefix='bench-deutschkurs-')
+    try:
+        userdata = os.path.join(root, 'resources', 'userdata')
+        stubs.make_corpus(userdata, params.topics, params.files, params.words, params.vocabulary, params.seed)
+        with open(os.path.join(DIR_THEME, 'theme.adoc'), 'r') as fin:
+            settings = json.load(fin)
+        settings['workers'] = params.workers
+        settings['duden_rate'] = 0
+        settings['duden_backoff'] = 0
+
+        results = {}
+        tracemalloc.start()
+
+        theme = make_theme(root, settings)
+        theme.check_environment()
+        theme.initialize_environment()
+        measure(results, 'analyze_userdata', theme.analyze_userdata)
+        theme.store.close()
+
+        theme = make_theme(root, settings)
+        theme.check_environment()
+        theme.initialize_environment()
+        measure(results, 'analyze_userdata_noop', theme.analyze_userdata)
+        measure(results, 'create_stats', theme.create_stats)
+        measure(results, 'create_page_word', write_pages, theme)
+        measure(results, 'create_page_word_noop', write_pages, theme)
+        measure(results, 'create_page_dictionary', theme.create_page_dictionary)
+        measure(results, 'build', theme.build)
+        theme.store.close()
+
+        tracemalloc.stop()
+        results['words'] = len(theme.cache['words'])
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def run(params):
+    duden = stubs.install(params.latency, params.missing)
+    runs = [run_once(params) for i in range(params.repeat)]
+
+    report = {}
+    report['params'] = vars(params).copy()
+    del(report['params']['compare'])
+    del(report['params']['output'])
+    report['python'] = platform.python_version()
+    report['platform'] = platform.platform()
+    report['words'] = runs[0]['words']
+    report['duden_calls'] = duden.calls
+    report['phases'] = {}
+    for phase in PHASES:
+        report['phases'][phase] = {}
+        report['phases'][phase]['seconds'] = min(run[phase]['seconds'] for run in runs)
+        report['phases'][phase]['peak_kb'] = max(run[phase]['peak_kb'] for run in runs)
+    return report
+
+
+def compare(report, baseline, threshold):
+    """Return the list of phases slower or bigger than the baseline"""
+    regressions = []
+    for phase in PHASES:
+        try:
+            old = baseline['phases'][phase]
+        except KeyError:
+            continue
+        new = report['phases'][phase]
+        for metric in ['seconds', 'peak_kb']:
+            if old[metric] > 0 and new[metric] > old[metric] * (1 + threshold):
+                regressions.append({'phase': phase, 'metric': metric, 'baseline': old[metric], 'current': new[metric]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the deutschkurs theme offline')
+    parser.add_argument('-topics', type=int, default=4, help='Number of topics')
+    parser.add_argument('-files', type=int, default=25, help='Files per topic')
+    parser.add_argument('-words', type=int, default=400, help='Words per file')
+    parser.add_argument('-vocabulary', type=int, default=5000, help='Distinct stems in the corpus')
+    parser.add_argument('-seed', type=int, default=0, help='Random seed of the corpus')
+    parser.add_argument('-latency', type=float, default=0.0, help='Seconds per stub Duden call')
+    parser.add_argument('-missing', type=float, default=0.2, help='Ratio of words unknown to Duden')
+    parser.add_argument('-workers', type=int, default=os.cpu_count() or 1, help='Theme workers setting')
+    parser.add_argument('-repeat', type=int, default=1, help='Runs per phase (best time is kept)')
+    parser.add_argument('-output', help='Write the JSON report to this file')
+    parser.add_argument('-compare', help='Baseline JSON report to compare with')
+    parser.add_argument('-threshold', type=float, default=0.2, help='Allowed slowdown ratio before flagging a regression')
+    params = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    report = run(params)
+
+    status = 0
+    if params.compare is not None:
+        with open(params.compare, 'r') as fin:
+            baseline = json.load(fin)
+        report['regressions'] = compare(report, baseline, params.threshold)
+        if len(report['regressions']) > 0:
+            status = 1
+
+    output = json.dumps(report, indent=4, sort_keys=True)
+    if params.output is not None:
+        with open(params.output, 'w') as fout:
+            fout.write(output)
+    print(output)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Word record benchmark.
+
+# File: bench_wordrecord.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: memory and load time of the words cache as plain
+# dictionaries (before) and as WordRecords (after). Usage:
+#   python3 benchmarks/bench_wordrecord.py [sizes...]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import string
+import shutil
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'deutschkurs', 'logic'))
+
+from cachestore import CacheStore
+
+SIZES = [10000, 50000, 100000]
+LETTERS = string.ascii_lowercase + 'äöü'
+POS = ['Noun', 'Verb', 'Adjective', 'Adverb', 'Determiner', 'Pronoun', 'Adposition']
+TOPICS = ['grundschule', 'arbeit', 'arzt', 'wohnung', 'behörde', 'einkaufen']
+# Ratio of words with a Duden export
+NOUNS = 0.4
+
+
+def make_words(n, seed=0):
+    rnd = random.Random(seed)
+    words = {}
+    while len(words) < n:
+        word = ''.join(rnd.choice(LETTERS) for i in range(rnd.randint(3, 12)))
+        entry = {}
+        entry['title'] = word.title()
+        entry['article'] = ''
+        entry['part_of_speech'] = rnd.choice(POS)
+        entry['topic'] = sorted(rnd.sample(TOPICS, rnd.randint(1, 3)))
+        if rnd.random() < NOUNS:
+            entry['title'] = "%s, das" % word.title()
+            entry['article'] = 'das'
+            entry['name'] = word.title()
+            entry['meaning_overview'] = "Bedeutung von %s. " % word * 20
+            entry['synonyms'] = [word + 'x', word + 'y']
+        words[word] = entry
+    return words
+
+
+def load_dicts(store):
+    """Loading as done before WordRecord, with the Duden data"""
+    words = {}
+    cur = store.conn.execute("SELECT key, value, extra FROM entries WHERE section = 'words'")
+    for key, value, extra in cur:
+        words[key] = json.loads(value)
+        if extra is not None:
+            words[key].update(json.loads(extra))
+    return words
+
+
+def load_records(store):
+    return store.load()['words']
+
+
+def measure(func, store):
+    tracemalloc.start()
+    start = time.perf_counter()
+    words = func(store)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, current // 1024, len(words)
+
+
+def main(sizes):
+    print("%10s %10s %12s %12s %12s %12s" % ('words', 'db (kb)', 'dict (s)', 'record (s)', 'dict (kb)', 'record (kb)'))
+    for size in sizes:
+        directory = tempfile.mkdtemp(prefix='bench-wordrecord-')
+        try:
+            path = os.path.join(directory, 'cache.db')
+            store = CacheStore(path)
+            store.open()
+            words = make_words(size)
+            for key in words:
+                store.touch('words', key)
+            store.commit({'words': words})
+            del(words)
+            tdict, mdict, n = measure(load_dicts, store)
+            trec, mrec, n = measure(load_records, store)
+            store.close()
+            print("%10d %10d %12.3f %12.3f %12d %12d" % (size, os.path.getsize(path) // 1024, tdict, trec, mdict, mrec))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main([int(size) for size in sys.argv[1:]])
+    else:
+        main(SIZES)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark stubs.
+
+# File: stubs.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: synthetic German corpus and offline replacements for the
+# spaCy model and the duden module used by the benchmarks
+"""
+
+import os
+import re
+import sys
+import time
+import types
+import random
+import zlib
+
+SYLLABLES = ['ber', 'ge', 'schu', 'le', 'kin', 'der', 'haus', 'ar', 'beit', 'spiel',
+             'gar', 'ten', 'mor', 'gen', 'lich', 'keit', 'ung', 'stra', 'ße', 'wo',
+             'che', 'frau', 'mann', 'zeit', 'tag', 'nacht', 'brot', 'fen', 'ster', 'tür',
+             'ö', 'ü', 'ä', 'lern', 'schreib', 'les', 'sprech', 'fahr', 'geh', 'komm']
+FUNCTION_WORDS = ['der', 'die', 'das', 'und', 'oder', 'mit', 'für', 'im', 'am', 'zum',
+                  'ich', 'du', 'sie', 'wir', 'ihr', 'nicht', 'auch', 'noch', 'sehr', 'heute']
+VERB_ENDINGS = ['en', 't', 'st', 'e']
+
+# Universal POS tags used by the stub model and their labels
+POS_LABELS = {
+    'NOUN': 'Noun',
+    'VERB': 'Verb',
+    'ADJ': 'Adjective',
+    'ADV': 'Adverb',
+    'DET': 'Determiner',
+    'PRON': 'Pronoun',
+    'ADP': 'Adposition',
+    'CCONJ': 'Coordinating Conjunction',
+    'NUM': 'Numeral',
+    'PUNCT': 'Punctuation',
+    'SPACE': 'Space',
+}
+OPEN_CLASSES = ['VERB', 'ADJ', 'ADV']
+CLOSED_CLASSES = ['DET', 'PRON', 'ADP', 'CCONJ']
+
+
+def make_vocabulary(size, seed=0):
+    """Return a list of 'size' distinct pseudo German lowercase stems"""
+    rnd = random.Random(seed)
+    vocabulary = set()
+    while len(vocabulary) < size:
+        stem = ''.join(rnd.choice(SYLLABLES) for i in range(rnd.randint(2, 4)))
+        vocabulary.add(stem)
+    return sorted(vocabulary)
+
+
+def make_sentence(rnd, vocabulary, length):
+    words = []
+    for i in range(length):
+        dice = rnd.random()
+        if dice < 0.35:
+            words.append(rnd.choice(FUNCTION_WORDS))
+        elif dice < 0.65:
+            words.append(rnd.choice(vocabulary).title())
+        elif dice < 0.97:
+            words.append(rnd.choice(vocabulary) + rnd.choice(VERB_ENDINGS))
+        else:
+            words.append(str(rnd.randint(1, 2030)))
+    words[0] = words[0].title()
+    return ' '.join(words) + rnd.choice(['.', '.', '!', '?'])
+
+
+def make_corpus(path, topics, files, words, vocabulary=5000, seed=0):
+    """
+    Write a synthetic userdata corpus: 'topics' directories with 'files'
+    text files each, every file holding about 'words' words.
+    """
+    rnd = random.Random(seed)
+    stems = make_vocabulary(vocabulary, seed)
+    for t in range(topics):
+        topicpath = os.path.join(path, 'thema%03d' % t)
+        os.makedirs(topicpath, exist_ok=True)
+        for f in range(files):
+            sentences = []
+            count = 0
+            while count < words:
+                length = rnd.randint(5, 15)
+                sentences.append(make_sentence(rnd, stems, length))
+                count += length
+            with open(os.path.join(topicpath, 'notiz%04d.txt' % f), 'w') as fout:
+                fout.write('\n'.join(sentences))
+
+
+class StubToken:
+    __slots__ = ['text', 'pos_', 'lemma_']
+
+    def __init__(self, text, pos, lemma):
+        self.text = text
+        self.pos_ = pos
+        self.lemma_ = lemma
+
+
+class StubNlp:
+    """
+    Tokenizer and deterministic POS tagger with the subset of the spaCy
+    Language API used by the theme.
+    """
+
+    pipe_names = ['stub_tagger']
+    TOKEN = re.compile(r"\w+|[^\w\s]")
+
+    def tag(self, text, start):
+        if text.isdigit():
+            return 'NUM'
+        if not text[0].isalnum():
+            return 'PUNCT'
+        if text.lower() in FUNCTION_WORDS:
+            return CLOSED_CLASSES[zlib.crc32(text.lower().encode('utf-8')) % len(CLOSED_CLASSES)]
+        if text[0].isupper() and not start:
+            return 'NOUN'
+        return OPEN_CLASSES[zlib.crc32(text.lower().encode('utf-8')) % len(OPEN_CLASSES)]
+
+    def lemma(self, text, pos):
+        if pos == 'VERB':
+            for ending in VERB_ENDINGS:
+                if text.endswith(ending):
+                    return text[:-len(ending)] + 'en'
+        return text
+
+    def __call__(self, text):
+        doc = []
+        start = True
+        for text in self.TOKEN.findall(text):
+            pos = self.tag(text, start)
+            doc.append(StubToken(text, pos, self.lemma(text, pos)))
+            start = pos == 'PUNCT'
+        return doc
+
+    def pipe(self, texts, as_tuples=False, batch_size=1000, n_process=1):
+        for item in texts:
+            if as_tuples:
+                text, context = item
+                yield self(text), context
+            else:
+                yield self(item)
+
+
+class StubMatch:
+    def __init__(self, word):
+        self.word = word
+
+    def export(self):
+        export = {}
+        export['title'] = "%s, der" % self.word
+        export['name'] = self.word
+        export['article'] = ['der', 'die', 'das'][zlib.crc32(self.word.encode('utf-8')) % 3]
+        export['part_of_speech'] = 'Substantiv, maskulin'
+        export['meaning_overview'] = "Bedeutung von %s. " % self.word * 20
+        export['synonyms'] = []
+        return export
+
+
+def make_duden(latency=0.0, missing=0.2):
+    """
+    Return a module replacing 'duden'. Every call sleeps 'latency' seconds
+    and a 'missing' ratio of the words is unknown.
+    """
+    module = types.ModuleType('duden')
+    module.calls = 0
+
+    def known(word):
+        return zlib.crc32(word.encode('utf-8')) % 1000 >= missing * 1000
+
+    def get(word):
+        module.calls += 1
+        time.sleep(latency)
+        if known(word):
+            return StubMatch(word)
+        return None
+
+    def search(word, exact=True):
+        module.calls += 1
+        time.sleep(latency)
+        return []
+
+    module.get = get
+    module.search = search
+    return module
+
+
+def install(latency=0.0, missing=0.2):
+    """Install the duden stub before the theme is imported"""
+    module = make_duden(latency, missing)
+    sys.modules['duden'] = module
+    return module
@@ -0,0 +1,230 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Bundle module.
+
+# File: bundle.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: export and import the caches as a single gzipped JSON
+# lines file, so a build can start warm without network lookups. Usage:
+#   python3 bundle.py export -sources <dir> -bundle cache.jsonl.gz
+#   python3 bundle.py import -sources <dir> -bundle cache.jsonl.gz
+"""
+
+import os
+import sys
+import json
+import gzip
+import time
+import base64
+import argparse
+
+from cachestore import CacheStore
+from manifest import Manifest
+from dictstore import DefinitionStore
+from wordrecord import WordRecord
+
+BUNDLE_FORMAT = 1
+SECTIONS = ['words', 'topics', 'duden_pending', 'duden_misses']
+BATCH_SIZE = 10000
+
+
+class BundleError(Exception):
+    pass
+
+
+def export_bundle(path, store, manifest=None, definitions=None):
+    """
+    Write the words (with their Duden data), topics and Duden lookup
+    state of the store, the files of the manifest and the definitions of
+    the Personal Dictionary to path. Return the number of lines per type.
+    """
+    counts = {'entry': 0, 'file': 0, 'definition': 0}
+    header = {}
+    header['type'] = 'header'
+    header['format'] = BUNDLE_FORMAT
+    header['created'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    header['word_key'] = store.get_meta('word_key', 'text')
+    with gzip.open(path, 'wt', encoding='utf-8') as fout:
+        fout.write(json.dumps(header) + '\n')
+        for section in SECTIONS:
+            # Values are written as stored, without parsing them again
+            for key, value in store.dump(section):
+                fout.write('{"type": "entry", "section": %s, "key": %s, "value": %s}\n' % (json.dumps(section), json.dumps(key), value))
+                counts['entry'] += 1
+        if manifest is not None:
+            for relpath in sorted(manifest.files):
+                fout.write(json.dumps({'type': 'file', 'path': relpath, 'value': manifest.files[relpath]}) + '\n')
+                counts['file'] += 1
+        if definitions is not None:
+            for dictionary, word, found, definition in definitions.rows():
+                line = {}
+                line['type'] = 'definition'
+                line['dictionary'] = dictionary
+                line['word'] = word
+                line['found'] = found
+                line['definition'] = base64.b64encode(definition).decode('ascii')
+                fout.write(json.dumps(line) + '\n')
+                counts['definition'] += 1
+    return counts
+
+
+def merge_word(cache, index, store, key, entry):
+    """
+    Merge a bundled word into the cache. New words are added as they are;
+    for known ones topics and forms are joined and the Duden data is only
+    taken if the local word has none. Return True if anything changed.
+    """
+    words = cache['words']
+    local = words.get(key)
+    has_duden = any(k not in WordRecord.FIELDS for k in entry)
+    if local is None:
+        local = words[key] = WordRecord.from_dict(key, entry)
+        index.add_word(key, local)
+        changed = True
+    else:
+        changed = False
+        topics = local['topic']
+        for topic in entry.get('topic', []):
+            if topic not in topics:
+                topics.append(topic)
+                index.add('topic', topic, key)
+                changed = True
+        local['topic'] = sorted(topics)
+        forms = set(local.get('forms', [])) | set(entry.get('forms', []))
+        if len(forms) > len(local.get('forms', [])):
+            local['forms'] = sorted(forms)
+            changed = True
+        if has_duden and local.extra is None:
+            for k, value in entry.items():
+                if k not in ['part_of_speech', 'topic', 'forms']:
+                    local[k] = value
+            changed = True
+
+    # Resolved by the bundle: no need to ask Duden again
+    if has_duden:
+        for section in ['duden_pending', 'duden_misses']:
+            if key in cache[section]:
+                del(cache[section][key])
+                store.touch(section, key)
+    if changed:
+        store.touch('words', key)
+    return changed
+
+
+def import_bundle(path, store, manifest=None, definitions=None):
+    """
+    Merge a bundle into the store, the manifest and the definitions.
+    Everything is committed at once at the end. Return the number of
+    lines merged per type. Raise BundleError if the bundle is damaged.
+    """
+    counts = {'entry': 0, 'file': 0, 'definition': 0}
+    cache = store.load()
+    index = store.load_index(cache['words'])
+    word_key = store.get_meta('word_key', 'text')
+    files = {}
+    rows = []
+    with gzip.open(path, 'rt', encoding='utf-8') as fin:
+        try:
+            try:
+                header = json.loads(fin.readline())
+            except ValueError:
+                raise BundleError("%s is not a cache bundle" % path)
+            if header.get('type') != 'header' or header.get('format') != BUNDLE_FORMAT:
+                raise BundleError("%s: unknown bundle format" % path)
+            if len(cache['words']) > 0 and header['word_key'] != word_key:
+                raise BundleError("Bundle words keyed by %s, cache by %s" % (header['word_key'], word_key))
+            store.set_meta('word_key', header['word_key'])
+
+            for line in fin:
+                record = json.loads(line)
+                kind = record['type']
+                if kind == 'entry':
+                    section = record['section']
+                    key = record['key']
+                    value = record['value']
+                    if section == 'words':
+                        changed = merge_word(cache, index, store, key, value)
+                    elif section in ['duden_pending', 'duden_misses']:
+                        # Only for words without Duden data here
+                        changed = key not in cache['words'] or cache['words'][key].extra is None
+                        if section == 'duden_misses':
+                            changed = changed and value > cache[section].get(key, 0)
+                        else:
+                            changed = changed and key not in cache[section]
+                        if changed:
+                            cache[section][key] = value
+                            store.touch(section, key)
+                    else:
+                        changed = key not in cache[section]
+                        if changed:
+                            cache[section][key] = value
+                            store.touch(section, key)
+                    counts['entry'] += int(changed)
+                elif kind == 'file' and manifest is not None:
+                    # The local version of a file always wins
+                    if record['path'] not in manifest.files:
+                        files[record['path']] = record['value']
+                elif kind == 'definition' and definitions is not None:
+                    rows.append((record['dictionary'], record['word'], record['found'], base64.b64decode(record['definition'])))
+                    if len(rows) >= BATCH_SIZE:
+                        definitions.merge_rows(rows)
+                        counts['definition'] += len(rows)
+                        rows = []
+        except (EOFError, OSError, ValueError, KeyError, TypeError, AttributeError) as error:
+            # Truncated or damaged: nothing is merged into the store or the
+            # manifest (definitions already merged are valid as they are)
+            store.discard()
+            raise BundleError("%s: damaged bundle (%s: %s)" % (path, type(error).__name__, error))
+
+    store.commit(cache, index)
+    if len(files) > 0:
+        manifest.files.update(files)
+        manifest.save()
+        counts['file'] = len(files)
+    if definitions is not None and len(rows) > 0:
+        definitions.merge_rows(rows)
+        counts['definition'] += len(rows)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export or import the deutschkurs caches')
+    parser.add_argument('command', choices=['export', 'import'])
+    parser.add_argument('-sources', required=True, help='KB4IT sources directory (with resources/cache)')
+    parser.add_argument('-bundle', required=True, help='Bundle file (gzipped JSON lines)')
+    parser.add_argument('-dict', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dict', 'dict.db'), help='Personal Dictionary database')
+    params = parser.parse_args()
+
+    DIR_CACHE = os.path.join(params.sources, 'resources', 'cache')
+    os.makedirs(DIR_CACHE, exist_ok=True)
+    store = CacheStore(os.path.join(DIR_CACHE, 'cache.db'))
+    store.open()
+    manifest = Manifest(os.path.join(DIR_CACHE, 'manifest.json'))
+    manifest.load()
+    definitions = None
+    if params.command == 'import' or os.path.exists(params.dict):
+        os.makedirs(os.path.dirname(params.dict), exist_ok=True)
+        definitions = DefinitionStore(params.dict)
+
+    start = time.perf_counter()
+    try:
+        if params.command == 'export':
+            counts = export_bundle(params.bundle, store, manifest, definitions)
+        else:
+            counts = import_bundle(params.bundle, store, manifest, definitions)
+    except BundleError as error:
+        print("Error: %s" % error)
+        return 1
+    finally:
+        store.close()
+        if definitions is not None:
+            definitions.close()
+    print("%s: %d entries, %d files, %d definitions in %.2fs" % (params.command, counts['entry'], counts['file'], counts['definition'], time.perf_counter() - start))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
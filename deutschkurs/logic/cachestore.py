@@ -0,0 +1,281 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Cache store module.
+
+# File: cachestore.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: SQLite backend for the global words cache
+"""
+
+import os
+import json
+import uuid
+import sqlite3
+import threading
+
+from wordindex import WordIndex
+from wordrecord import WordRecord, LAZY
+
+SCHEMA_VERSION = 3
+SECTIONS = ['words', 'topics', 'duden_pending', 'duden_misses', 'legacy']
+
+SQL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    section TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    extra TEXT,
+    PRIMARY KEY (section, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    kind TEXT NOT NULL,
+    term TEXT NOT NULL,
+    word TEXT NOT NULL,
+    PRIMARY KEY (kind, term, word)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class CacheStoreError(Exception):
+    pass
+
+
+class CacheStore:
+    """
+    Transactional store for the global cache.
+
+    Every entry of each cache section ('words', 'topics', ...) is stored as a
+    JSON document in its own row, so saving the cache only rewrites the
+    entries marked as dirty, in a single transaction. The Duden data of
+    a word is kept apart in the 'extra' column, only read when used. The
+    inverted indexes of the words (see wordindex.WordIndex) are kept in
+    the postings table.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self.dirty = {}
+        self.lock = threading.RLock()
+        self.bytes_written = 0
+        self.store_id = None
+        self.generation = 0
+        self.data_version = None
+
+    def open(self):
+        try:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SQL_SCHEMA)
+            self.upgrade()
+            self.set_meta('schema', SCHEMA_VERSION)
+            self.store_id = self.get_meta('id')
+            if self.store_id is None:
+                self.store_id = uuid.uuid4().hex
+                self.set_meta('id', self.store_id)
+            self.generation = self.get_meta('generation', 0)
+            self.conn.commit()
+        except sqlite3.DatabaseError as error:
+            raise CacheStoreError("Cache database '%s' unusable: %s" % (self.path, error))
+
+    def upgrade(self):
+        """Move the Duden data of the words of a version 2 store to 'extra'"""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(entries)")]
+        if 'extra' in columns:
+            return
+        with self.conn:
+            self.conn.execute("ALTER TABLE entries ADD COLUMN extra TEXT")
+            cur = self.conn.execute("SELECT key, value FROM entries WHERE section = 'words'")
+            for key, value in cur.fetchall():
+                entry = json.loads(value)
+                core = dict((k, entry.pop(k)) for k in WordRecord.FIELDS if k in entry)
+                extra = json.dumps(entry) if len(entry) > 0 else None
+                self.conn.execute("UPDATE entries SET value = ?, extra = ? WHERE section = 'words' AND key = ?", (json.dumps(core), extra, key))
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def is_empty(self):
+        cur = self.conn.execute("SELECT 1 FROM entries LIMIT 1")
+        return cur.fetchone() is None
+
+    def get_meta(self, key, default=None):
+        with self.lock:
+            cur = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,))
+            row = cur.fetchone()
+        if row is None:
+            return default
+        return json.loads(row[0])
+
+    def set_meta(self, key, value):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def discard(self):
+        """Forget the changes made since the last commit"""
+        with self.lock:
+            self.conn.rollback()
+            self.dirty = {}
+
+    def is_current(self):
+        """
+        Return True if nothing was left uncommitted and no other connection
+        (eg.: bundle.py) committed since the last load()
+        """
+        if self.conn is None or len(self.dirty) > 0:
+            return False
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0] == self.data_version
+
+    def load(self):
+        cache = {}
+        for section in SECTIONS:
+            cache[section] = {}
+        with self.lock:
+            self.data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            cur = self.conn.execute("SELECT section, key, value, extra IS NOT NULL FROM entries")
+            for section, key, value, has_extra in cur:
+                value = json.loads(value)
+                if section == 'words':
+                    value = WordRecord.from_dict(key, value, self)
+                    if has_extra:
+                        # Duden fields stay in the database until used
+                        value.extra = LAZY
+                try:
+                    cache[section][key] = value
+                except KeyError:
+                    cache[section] = {key: value}
+        self.dirty = {}
+        return cache
+
+    def dump(self, section):
+        """
+        Return the (key, JSON value) of all entries of a section. The
+        Duden data of the words is joined to their JSON object as is.
+        """
+        dump = []
+        with self.lock:
+            cur = self.conn.execute("SELECT key, value, extra FROM entries WHERE section = ? ORDER BY key", (section,))
+            for key, value, extra in cur:
+                if extra is not None and extra != '{}':
+                    value = "%s, %s" % (value[:-1], extra[1:])
+                dump.append((key, value))
+        return dump
+
+    def get_extra(self, key):
+        """Return the Duden data of a word or None"""
+        with self.lock:
+            cur = self.conn.execute("SELECT extra FROM entries WHERE section = 'words' AND key = ?", (key,))
+            row = cur.fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def load_index(self, words):
+        """
+        Return the persisted WordIndex.
+
+        The index is built from the words once if the store has none yet.
+        """
+        index = WordIndex()
+        if not self.get_meta('index', False):
+            index.rebuild(words)
+            self.set_meta('index', True)
+            return index
+        with self.lock:
+            cur = self.conn.execute("SELECT kind, term, word FROM postings")
+            for kind, term, word in cur:
+                try:
+                    index.index[kind][term].add(word)
+                except KeyError:
+                    index.index[kind][term] = set([word])
+        return index
+
+    def version(self):
+        """
+        Return an id of the current content of the words and their index.
+        The generation is bumped by every commit changing them.
+        """
+        return "%s-%d" % (self.store_id, self.generation)
+
+    def touch(self, section, key):
+        """Mark an entry as modified (or deleted) since the last commit"""
+        try:
+            self.dirty[section].add(key)
+        except KeyError:
+            self.dirty[section] = set([key])
+
+    def commit(self, cache, index=None):
+        """Write dirty entries of cache and index changes in one transaction"""
+        nbytes = 0
+        written = []
+        with self.lock:
+            with self.conn:
+                if len(self.dirty.get('words', [])) > 0 or (index is not None and len(index.delta) > 0):
+                    self.generation += 1
+                    self.set_meta('generation', self.generation)
+                if index is not None:
+                    for (kind, term, word), added in index.delta.items():
+                        if added:
+                            self.conn.execute("INSERT OR IGNORE INTO postings (kind, term, word) VALUES (?, ?, ?)", (kind, term, word))
+                        else:
+                            self.conn.execute("DELETE FROM postings WHERE kind = ? AND term = ? AND word = ?", (kind, term, word))
+                    index.delta = {}
+                for section, keys in self.dirty.items():
+                    entries = cache.get(section, {})
+                    for key in keys:
+                        try:
+                            entry = entries[key]
+                        except KeyError:
+                            self.conn.execute("DELETE FROM entries WHERE section = ? AND key = ?", (section, key))
+                            continue
+                        if section != 'words':
+                            value = json.dumps(entry)
+                            nbytes += len(value)
+                            self.conn.execute("INSERT OR REPLACE INTO entries (section, key, value) VALUES (?, ?, ?)", (section, key, value))
+                            continue
+                        if not isinstance(entry, WordRecord):
+                            entry = WordRecord.from_dict(key, dict(entry))
+                        value = json.dumps(entry.core())
+                        nbytes += len(value)
+                        if entry.extra is LAZY:
+                            # Duden data unchanged since loaded
+                            self.conn.execute("UPDATE entries SET value = ? WHERE section = ? AND key = ?", (value, section, key))
+                        else:
+                            extra = json.dumps(entry.extra) if entry.extra else None
+                            nbytes += len(extra or '')
+                            self.conn.execute("INSERT OR REPLACE INTO entries (section, key, value, extra) VALUES (?, ?, ?, ?)", (section, key, value, extra))
+                        if entry.source is None:
+                            entry.source = self
+                        written.append(entry)
+            self.dirty = {}
+            for entry in written:
+                entry.unload()
+        self.bytes_written += nbytes
+        return nbytes
+
+    def migrate(self, path):
+        """
+        Import a legacy cache.json into an empty store.
+
+        The JSON file is renamed to '<path>.migrated' once its content is
+        committed. Return the number of words imported.
+        """
+        with open(path, 'r') as fc:
+            cache = json.load(fc)
+        for section in SECTIONS:
+            for key in cache.get(section, {}):
+                self.touch(section, key)
+        self.commit(cache)
+        os.replace(path, "%s.migrated" % path)
+        return len(cache.get('words', {}))
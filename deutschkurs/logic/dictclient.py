@@ -0,0 +1,186 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+DICT client module.
+
+# File: dictclient.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: minimal RFC 2229 client with pipelined DEFINE commands
+"""
+
+import socket
+import threading
+
+DICT_PORT = 2628
+PIPELINE = 64
+
+
+class DictError(Exception):
+    pass
+
+
+def valid(text):
+    """Control characters (eg.: CR or LF) would end or split a command"""
+    return len(text) > 0 and not any(ord(c) < 32 or ord(c) == 127 for c in text)
+
+
+def quote(word):
+    """Quote a word as an RFC 2229 string. Raise DictError if not valid"""
+    if not valid(word):
+        raise DictError("Invalid word or database: %r" % word)
+    word = word.replace('\\', '\\\\').replace('"', '\\"')
+    return '"%s"' % word
+
+
+class DictConnection:
+    """A connection to a dictd server"""
+
+    def __init__(self, host='localhost', port=DICT_PORT, timeout=10):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.fin = self.sock.makefile('rb')
+        code, line = self.status()
+        if code != 220:
+            self.close()
+            raise DictError("Unexpected banner: %s" % line)
+        self.sock.sendall(b"CLIENT kb4it\r\n")
+        self.status()
+
+    def close(self):
+        try:
+            self.sock.sendall(b"QUIT\r\n")
+        except OSError:
+            pass
+        self.fin.close()
+        self.sock.close()
+
+    def readline(self):
+        line = self.fin.readline()
+        if not line:
+            raise DictError("Connection closed by server")
+        return line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def status(self):
+        line = self.readline()
+        try:
+            return int(line[:3]), line
+        except ValueError:
+            raise DictError("Invalid response: %s" % line)
+
+    def text(self):
+        """Read a dot terminated text block"""
+        lines = []
+        while True:
+            line = self.readline()
+            if line == '.':
+                return lines
+            if line.startswith('..'):
+                line = line[1:]
+            lines.append(line)
+
+    def response(self):
+        """
+        Read the response to a DEFINE command. Return a list of tuples
+        (database, description, lines), empty if there was no match.
+        """
+        code, line = self.status()
+        if code == 552:
+            return []
+        if code != 150:
+            raise DictError(line)
+        definitions = []
+        while True:
+            code, line = self.status()
+            if code == 250:
+                return definitions
+            if code != 151:
+                raise DictError(line)
+            # 151 "word" database "description"
+            parts = line.split('"')
+            try:
+                database = parts[2].strip()
+                description = parts[3]
+            except IndexError:
+                database = description = ''
+            definitions.append((database, description, self.text()))
+
+    def define_many(self, words, database):
+        """
+        Send DEFINE commands for many words at once and read the responses
+        in order. Return a list of definitions lists (see response).
+        """
+        # Everything is quoted before anything is sent
+        database = quote(database)
+        commands = ["DEFINE %s %s\r\n" % (database, quote(word)) for word in words]
+        results = []
+        for start in range(0, len(commands), PIPELINE):
+            batch = commands[start:start + PIPELINE]
+            self.sock.sendall(''.join(batch).encode('utf-8'))
+            for command in batch:
+                results.append(self.response())
+        return results
+
+
+class DictPool:
+    """Keep connections to a dictd server open between lookups"""
+
+    def __init__(self, host='localhost', port=DICT_PORT, timeout=10):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.lock:
+            if len(self.idle) > 0:
+                return self.idle.pop()
+        return DictConnection(self.host, self.port, self.timeout)
+
+    def put(self, conn):
+        with self.lock:
+            self.idle.append(conn)
+
+    def close(self):
+        with self.lock:
+            for conn in self.idle:
+                conn.close()
+            self.idle = []
+
+    def define_many(self, words, database):
+        """
+        Return a list of definitions lists, one per word. A broken
+        connection is dropped and the batch retried once on a new one.
+        """
+        # Invalid words are rejected without using a connection
+        for text in [database] + list(words):
+            quote(text)
+        for attempt in range(2):
+            conn = self.get()
+            try:
+                results = conn.define_many(words, database)
+            except (OSError, DictError):
+                conn.fin.close()
+                conn.sock.close()
+                if attempt > 0:
+                    raise
+                continue
+            self.put(conn)
+            return results
+
+
+def format_definitions(word, definitions):
+    """Format definitions as the 'dict' command line client does"""
+    if len(definitions) == 0:
+        return ('No definitions found for "%s"\n' % word).encode('utf-8')
+    if len(definitions) == 1:
+        lines = ["1 definition found", ""]
+    else:
+        lines = ["%d definitions found" % len(definitions), ""]
+    for database, description, text in definitions:
+        lines.append("From %s [%s]:" % (description, database))
+        lines.append("")
+        lines.extend("  %s" % line for line in text)
+        lines.append("")
+    return ('\n'.join(lines) + '\n').encode('utf-8')
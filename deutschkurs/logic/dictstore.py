@@ -0,0 +1,129 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Definitions store module.
+
+# File: dictstore.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: SQLite store for the Personal Dictionary definitions
+"""
+
+import os
+import sqlite3
+import threading
+
+ERR_DEF_NOT_FOUND = b"No definitions found"
+
+SQL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS definitions (
+    dictionary TEXT NOT NULL,
+    word TEXT NOT NULL,
+    found INTEGER NOT NULL,
+    definition BLOB NOT NULL,
+    PRIMARY KEY (dictionary, word)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS definitions_found ON definitions (dictionary, found);
+"""
+
+
+class DefinitionStore:
+    """
+    All definitions of the Personal Dictionary in a single file, one row
+    per (dictionary, word) with a flag telling if dictd found it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SQL_SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def is_empty(self):
+        with self.lock:
+            cur = self.conn.execute("SELECT 1 FROM definitions LIMIT 1")
+            return cur.fetchone() is None
+
+    def get(self, dictionary, word):
+        """Return the definition of a word or None if never looked up"""
+        with self.lock:
+            cur = self.conn.execute("SELECT definition FROM definitions WHERE dictionary = ? AND word = ?", (dictionary, word.lower()))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def known(self, dictionary, words):
+        """Return the subset of words already looked up"""
+        found = set()
+        with self.lock:
+            for word in words:
+                cur = self.conn.execute("SELECT 1 FROM definitions WHERE dictionary = ? AND word = ?", (dictionary, word.lower()))
+                if cur.fetchone() is not None:
+                    found.add(word)
+        return found
+
+    def put_many(self, dictionary, definitions):
+        """Store a list of (word, definition) in one transaction"""
+        rows = []
+        for word, definition in definitions:
+            found = int(ERR_DEF_NOT_FOUND not in definition)
+            rows.append((dictionary, word.lower(), found, definition))
+        with self.lock:
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO definitions (dictionary, word, found, definition) VALUES (?, ?, ?, ?)", rows)
+
+    def rows(self):
+        """Return all rows as (dictionary, word, found, definition)"""
+        with self.lock:
+            cur = self.conn.execute("SELECT dictionary, word, found, definition FROM definitions ORDER BY dictionary, word")
+            return cur.fetchall()
+
+    def merge_rows(self, rows):
+        """
+        Add rows (dictionary, word, found, definition) in one transaction.
+        An existing definition is only replaced if it was not found and
+        the new one was.
+        """
+        with self.lock:
+            with self.conn:
+                self.conn.executemany("""
+                    INSERT INTO definitions (dictionary, word, found, definition) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (dictionary, word) DO UPDATE SET found = excluded.found, definition = excluded.definition
+                    WHERE definitions.found < excluded.found""", rows)
+
+    def entries(self, found):
+        """Return the (dictionary, word) looked up with or without definitions"""
+        with self.lock:
+            cur = self.conn.execute("SELECT dictionary, word FROM definitions WHERE found = ? ORDER BY dictionary, word", (int(found),))
+            return cur.fetchall()
+
+    def import_directory(self, directory):
+        """
+        Import the former layout <directory>/<dictionary>/<letter>/<word>.def.
+        Return the number of definitions imported.
+        """
+        count = 0
+        for dictionary in sorted(os.listdir(directory)):
+            DIR_PERS_DICT = os.path.join(directory, dictionary)
+            if not os.path.isdir(DIR_PERS_DICT):
+                continue
+            definitions = []
+            for letter in os.listdir(DIR_PERS_DICT):
+                DIR_ENTRIES = os.path.join(DIR_PERS_DICT, letter)
+                if not os.path.isdir(DIR_ENTRIES):
+                    continue
+                for entry in os.listdir(DIR_ENTRIES):
+                    if not entry.endswith('.def'):
+                        continue
+                    with open(os.path.join(DIR_ENTRIES, entry), 'rb') as fe:
+                        definitions.append((entry[:-4], fe.read()))
+            self.put_many(dictionary, definitions)
+            count += len(definitions)
+        return count
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Duden lookup module.
+
+# File: dudenlookup.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: concurrent and rate limited resolution of words in Duden
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+FOUND = 'found'
+MISSING = 'missing'
+FAILED = 'failed'
+CACHED = 'cached'
+
+
+class RateLimiter:
+    """Allow at most 'rate' calls per second among all threads"""
+
+    def __init__(self, rate):
+        if rate > 0:
+            self.interval = 1.0 / rate
+        else:
+            self.interval = 0.0
+        self.next = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next)
+            self.next = start + self.interval
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class DudenResolver:
+    """
+    Resolve many words through a bounded pool of threads.
+
+    'fetch' is a callable taking a word and returning the Duden export
+    (a dict) or None if Duden does not know it. Any exception raised by
+    fetch is considered a transient error and retried with exponential
+    backoff. Passing another fetch allows to resolve words against a
+    local stub server.
+
+    'misses' maps keys to the time Duden last did not know them; those
+    keys are not looked up again until 'ttl' seconds later.
+    """
+
+    def __init__(self, fetch, workers=4, rate=2.0, retries=3, backoff=1.0, offline=False, misses=None, ttl=0):
+        self.fetch = fetch
+        self.workers = max(1, workers)
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.offline = offline
+        self.misses = misses if misses is not None else {}
+        self.ttl = ttl
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def lookup(self, word):
+        """Return a tuple (status, value) for a single word"""
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            self.limiter.wait()
+            start = time.perf_counter()
+            try:
+                ddict = self.fetch(word)
+            except Exception as exc:
+                error = exc
+                continue
+            finally:
+                with self.lock:
+                    self.latencies.append(time.perf_counter() - start)
+            if ddict is None:
+                return MISSING, None
+            return FOUND, ddict
+        return FAILED, error
+
+    def resolve(self, words):
+        """
+        Resolve a dictionary of key -> word.
+
+        Return a dictionary key -> (status, value). Words are looked up only
+        once even if several keys point to them. Keys missed within the TTL
+        are CACHED without a lookup. In offline mode nothing is looked up
+        and only the CACHED keys are returned.
+        """
+        now = time.time()
+        resolved = {}
+        lookups = {}
+        for key, word in words.items():
+            if key in self.misses and now - self.misses[key] < self.ttl:
+                resolved[key] = (CACHED, None)
+            else:
+                lookups[key] = word
+        if self.offline or len(lookups) == 0:
+            return resolved
+
+        unique = sorted(set(lookups.values()))
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(unique))) as pool:
+            results = dict(zip(unique, pool.map(self.lookup, unique)))
+
+        for key, word in lookups.items():
+            resolved[key] = results[word]
+        return resolved
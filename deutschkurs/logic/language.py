@@ -0,0 +1,179 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Language module.
+
+# File: language.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: lazy loading of the spaCy German models
+"""
+
+import time
+
+# spaCy model by size. Any other value is used as the package name
+NLP_MODELS = {
+    'sm': 'de_core_news_sm',
+    'md': 'de_core_news_md',
+    'lg': 'de_core_news_lg',
+    'trf': 'de_dep_news_trf',
+}
+
+# Only token.pos_ and token.text are used, so the pipeline components
+# which do not contribute to the POS tags are never loaded (the
+# lemmatizer is loaded when words are keyed by lemma, see nlp_exclude)
+NLP_EXCLUDE = ['parser', 'ner', 'lemmatizer', 'senter']
+
+MODELS = {}
+
+# POS tag -> label, filled on demand by explain_pos
+POS_LABELS = {}
+
+# Tokens with these POS tags are never words
+SKIP_POS = ['PUNCT', 'SPACE', 'NUM']
+
+
+class LanguageModelError(Exception):
+    pass
+
+
+def model_name(model):
+    return NLP_MODELS.get(model, model)
+
+
+def nlp_exclude(word_key='text'):
+    """Return the components not needed for the 'word_key' setting"""
+    if word_key == 'lemma':
+        return [name for name in NLP_EXCLUDE if name != 'lemmatizer']
+    return NLP_EXCLUDE
+
+
+def load_model(model, exclude=NLP_EXCLUDE):
+    """
+    Load a spaCy model once per process.
+
+    Return a tuple (nlp, seconds). Seconds is 0.0 if the model was already
+    loaded. Raise LanguageModelError if spaCy or the model are missing.
+    """
+    name = model_name(model)
+    key = (name, tuple(exclude))
+    try:
+        return MODELS[key], 0.0
+    except KeyError:
+        pass
+
+    start = time.perf_counter()
+    try:
+        import spacy # spaCy is library for advanced Natural Language Processing in Python (https://spacy.io)
+    except ImportError as error:
+        raise LanguageModelError("spaCy not installed: %s" % error)
+    try:
+        nlp = spacy.load(name, exclude=exclude)
+    except OSError as error:
+        raise LanguageModelError("Model '%s' not found. Download it manually: python3 -m spacy download %s" % (name, name))
+    elapsed = time.perf_counter() - start
+    MODELS[key] = nlp
+    return nlp, elapsed
+
+
+def explain_pos(pos):
+    """Return the human readable label of a POS tag, eg.: NOUN -> Noun"""
+    try:
+        return POS_LABELS[pos]
+    except KeyError:
+        import spacy
+        label = POS_LABELS[pos] = spacy.explain(pos).title()
+        return label
+
+
+def has_digit(text):
+    if text.isalpha():
+        return False
+    for letter in text:
+        if letter.isdigit():
+            return True
+    return False
+
+
+def extract_words(doc, by_lemma=False):
+    """
+    Return the words of a doc as a dictionary key -> (text, pos, forms) in
+    order of first appearance. The key is the lowercase text (or lemma),
+    text and pos those of its first token, and forms the set of lowercase
+    surface forms found for it. Tokens tagged as punctuation, space or
+    number and tokens with digits ("16.02.2021." is tagged as ADJ) are
+    not words.
+    """
+    if hasattr(doc, 'to_array'):
+        return extract_words_array(doc, by_lemma)
+
+    words = {}
+    for token in doc:
+        if token.pos_ in SKIP_POS or has_digit(token.text):
+            continue
+        if by_lemma:
+            text = token.lemma_ or token.text
+        else:
+            text = token.text
+        form = token.text.lower()
+        try:
+            words[text.lower()][2].add(form)
+        except KeyError:
+            words[text.lower()] = (text, token.pos_, set([form]))
+    return words
+
+
+def extract_words_array(doc, by_lemma=False):
+    """
+    Same as extract_words for a spaCy Doc. Tokens are filtered and
+    deduplicated as arrays of attribute ids, so strings are only looked up
+    once per distinct word.
+    """
+    import numpy
+    from spacy.attrs import POS, ORTH, LOWER, LEMMA
+    from spacy.parts_of_speech import IDS, NAMES
+
+    words = {}
+    array = doc.to_array([POS, ORTH, LOWER, LEMMA])
+    if len(array) == 0:
+        return words
+    pos, orth, lower, lemma = array.T
+    strings = doc.vocab.strings
+
+    mask = ~numpy.isin(pos, [IDS[tag] for tag in SKIP_POS])
+    digits = [h for h in numpy.unique(orth[mask]).tolist() if has_digit(strings[h])]
+    if len(digits) > 0:
+        mask &= ~numpy.isin(orth, digits)
+    tokens = numpy.flatnonzero(mask)
+    if by_lemma:
+        # Without lemma (0) the token text is used
+        keys = numpy.where(lemma[tokens] != 0, lemma[tokens], orth[tokens])
+    else:
+        keys = lower[tokens]
+
+    # The surface forms of a key are only other than the key for lemmas
+    forms = {}
+    if by_lemma:
+        pairs = numpy.stack([keys, lower[tokens]], axis=1)
+        pairs = pairs[numpy.lexsort((pairs[:, 1], pairs[:, 0]))]
+        distinct = numpy.ones(len(pairs), dtype=bool)
+        distinct[1:] = (pairs[1:] != pairs[:-1]).any(axis=1)
+        for key, form in pairs[distinct].tolist():
+            forms.setdefault(key, set()).add(strings[form])
+
+    # First token of every key, in order. Distinct ids may have the same
+    # lowercase string (eg.: lemmas 'Kind' and 'kind')
+    uniq, first = numpy.unique(keys, return_index=True)
+    first.sort()
+    if by_lemma:
+        texts = keys[first].tolist()
+    else:
+        texts = orth[tokens[first]].tolist()
+    for key, text, tag in zip(keys[first].tolist(), texts, pos[tokens[first]].tolist()):
+        text = strings[text]
+        try:
+            words[text.lower()][2].update(forms.get(key, [text.lower()]))
+        except KeyError:
+            words[text.lower()] = (text, NAMES[tag], set(forms.get(key, [text.lower()])))
+    return words
@@ -0,0 +1,125 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Manifest module.
+
+# File: manifest.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: keep track of the userdata files already analyzed
+"""
+
+import os
+import json
+import hashlib
+
+from util import atomic_write
+
+MANIFEST_VERSION = 1
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_digest(filepath):
+    """Return the sha256 hex digest of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as fin:
+        for block in iter(lambda: fin.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    Per-file record of the userdata already analyzed.
+
+    Each entry is keyed by the path of the file relative to the userdata
+    directory ('topic/filename') and holds its size, mtime, content hash
+    and the words it contributed to the global cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as fm:
+                data = json.load(fm)
+            self.files = data['files']
+        except FileNotFoundError:
+            self.files = {}
+        except (ValueError, KeyError):
+            # An unreadable manifest only means everything is analyzed again
+            self.files = {}
+        return len(self.files)
+
+    def save(self):
+        data = {}
+        data['version'] = MANIFEST_VERSION
+        data['files'] = self.files
+        atomic_write(self.path, json.dumps(data))
+
+    def scan(self, userdata):
+        """
+        Compare the userdata directory against the manifest.
+
+        Return a tuple (changed, deleted, unchanged). 'changed' is a sorted
+        list of (relpath, topic, filepath, stat, digest) for new or modified
+        files, 'deleted' a sorted list of relpaths no longer present. Files
+        whose size and mtime did not change are not hashed again.
+        """
+        changed = []
+        unchanged = 0
+        present = set()
+        for topic in sorted(os.listdir(userdata)):
+            topicpath = os.path.join(userdata, topic)
+            if not os.path.isdir(topicpath):
+                continue
+            for filename in sorted(os.listdir(topicpath)):
+                filepath = os.path.join(topicpath, filename)
+                if not os.path.isfile(filepath):
+                    continue
+                relpath = "%s/%s" % (topic, filename)
+                present.add(relpath)
+                stat = os.stat(filepath)
+                entry = self.files.get(relpath)
+                if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                    unchanged += 1
+                    continue
+                digest = file_digest(filepath)
+                if entry is not None and entry['sha256'] == digest:
+                    # Touched but not modified: refresh stat info only
+                    entry['size'] = stat.st_size
+                    entry['mtime'] = stat.st_mtime
+                    unchanged += 1
+                    continue
+                changed.append((relpath, topic, filepath, stat, digest))
+        deleted = sorted(set(self.files) - present)
+        return changed, deleted, unchanged
+
+    def update(self, relpath, topic, stat, digest, words):
+        entry = {}
+        entry['topic'] = topic
+        entry['size'] = stat.st_size
+        entry['mtime'] = stat.st_mtime
+        entry['sha256'] = digest
+        entry['words'] = sorted(words)
+        self.files[relpath] = entry
+
+    def remove(self, relpath):
+        return self.files.pop(relpath, None)
+
+    def topics(self):
+        return set(entry['topic'] for entry in self.files.values())
+
+    def contributions(self):
+        """Return a reverse index word -> set of topics contributing it"""
+        index = {}
+        for entry in self.files.values():
+            for word in entry['words']:
+                try:
+                    index[word].add(entry['topic'])
+                except KeyError:
+                    index[word] = set([entry['topic']])
+        return index
@@ -0,0 +1,89 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Memo module.
+
+# File: memo.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: aggregates derived from the words cache, computed once
+"""
+
+import json
+import threading
+
+from util import atomic_write
+
+
+class Memo:
+    """
+    Values derived from the words cache (letters, tagclouds, stats...)
+    computed once per version of the cache. Values marked as persistent
+    are saved, so a build without changes reuses them from the previous
+    one. All methods are thread safe.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.version = None
+        self.values = {}
+        self.persistent = set()
+        self.lock = threading.Lock()
+        self.computing = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, version):
+        """Load the values saved for this version of the cache, if any"""
+        self.reset(version)
+        try:
+            with open(self.path, 'r') as fin:
+                data = json.load(fin)
+        except (FileNotFoundError, ValueError):
+            return 0
+        if data.get('version') != version:
+            return 0
+        with self.lock:
+            self.values = data['values']
+            self.persistent = set(self.values)
+        return len(self.values)
+
+    def save(self):
+        with self.lock:
+            data = {}
+            data['version'] = self.version
+            data['values'] = dict((name, self.values[name]) for name in self.persistent)
+        atomic_write(self.path, json.dumps(data))
+
+    def reset(self, version):
+        """Forget all values if the cache changed since they were computed"""
+        with self.lock:
+            if version != self.version:
+                self.version = version
+                self.values = {}
+                self.persistent = set()
+
+    def get(self, name, compute, persist=False):
+        """Return the value 'name', calling compute() only the first time"""
+        with self.lock:
+            try:
+                value = self.values[name]
+                self.hits += 1
+                return value
+            except KeyError:
+                lock = self.computing.setdefault(name, threading.Lock())
+
+        # Pages built at the same time wait for the first one computing it
+        with lock:
+            with self.lock:
+                if name in self.values:
+                    self.hits += 1
+                    return self.values[name]
+            value = compute()
+            with self.lock:
+                self.values[name] = value
+                self.misses += 1
+                if persist:
+                    self.persistent.add(name)
+        return value
@@ -0,0 +1,99 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Metrics module.
+
+# File: metrics.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: timers and counters per build phase
+"""
+
+import os
+import glob
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+from util import atomic_write
+
+PERCENTILES = [50, 90, 99]
+MAX_REPORTS = 20
+
+
+def percentile(values, p):
+    """Nearest rank percentile of a sorted list"""
+    if len(values) == 0:
+        return 0.0
+    rank = max(0, int(round(p / 100.0 * len(values))) - 1)
+    return values[min(rank, len(values) - 1)]
+
+
+class Metrics:
+    """
+    Collect per phase timers, counters and samples (eg.: latencies) of a
+    build. All methods are thread safe.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.timers = {}
+        self.counters = {}
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def sample(self, name, values):
+        with self.lock:
+            try:
+                self.samples[name].extend(values)
+            except KeyError:
+                self.samples[name] = list(values)
+
+    def summary(self, name):
+        values = sorted(self.samples.get(name, []))
+        summary = {}
+        summary['count'] = len(values)
+        for p in PERCENTILES:
+            summary['p%d' % p] = percentile(values, p)
+        return summary
+
+    def report(self):
+        report = {}
+        report['started'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started))
+        report['elapsed'] = time.time() - self.started
+        with self.lock:
+            report['timers'] = dict(self.timers)
+            report['counters'] = dict(self.counters)
+            report['samples'] = {}
+            for name in self.samples:
+                report['samples'][name] = self.summary(name)
+        return report
+
+    def save(self, directory, prefix='build'):
+        """Write the report of this build and keep only the last ones"""
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))
+        path = os.path.join(directory, "%s-%s.json" % (prefix, stamp))
+        atomic_write(path, json.dumps(self.report(), indent=4, sort_keys=True))
+        reports = sorted(glob.glob(os.path.join(directory, '%s-*.json' % prefix)))
+        for old in reports[:-MAX_REPORTS]:
+            os.unlink(old)
+        return path
@@ -16,20 +16,24 @@ import subprocess
 from kb4it.core.service import Service
 
 from util import which, execmd
-
-ERR_DEF_NOT_FOUND = b"No definitions found"
+from dictclient import DictPool, DictError, format_definitions, valid
+from dictstore import DefinitionStore, ERR_DEF_NOT_FOUND
 
 DIR_ROOT = os.path.abspath(sys.modules[__name__].__file__ + "/..")
 DIR_DICT = os.path.join(DIR_ROOT, 'dict')
 FILE_DICT = os.path.join(DIR_DICT, 'dict.json')
+FILE_DICT_DB = os.path.join(DIR_DICT, 'dict.db')
 
 
 class PersonalDictionary(Service):
     mydict = {}
     available = False
+    pool = None
+    store = None
 
-    def __init__(self, debug_level="INFO"):
+    def __init__(self, debug_level="INFO", host='localhost', port=2628):
         # ~ self.msg = log.get_logger("Dictionary", debug_level)
+        self.pool = DictPool(host, port)
         self.checks()
         # ~ self.log.debug("Personal Dictionary module initialized")
 
@@ -42,6 +46,13 @@ class PersonalDictionary(Service):
             os.makedirs('dict')
             # ~ self.log.debug("Directory 'dict' created")
 
+        # Packed definitions, imported once from the former .def files
+        os.makedirs(DIR_DICT, exist_ok=True)
+        self.store = DefinitionStore(FILE_DICT_DB)
+        if self.store.is_empty():
+            n = self.store.import_directory(DIR_DICT)
+            # ~ self.log.debug("%d definitions imported into %s", n, FILE_DICT_DB)
+
         # Check dictionary server availability
         DICTD_AVAILABLE = which('dictd')
         self.available = self.available or DICTD_AVAILABLE
@@ -53,40 +64,54 @@ class PersonalDictionary(Service):
         # ~ self.log.debug("Dictionary client available? %s", DICTC_AVAILABLE)
 
     def lookup(self, word, dictionary="fd-deu-eng"):
-        FILE_DEF = os.path.join(DIR_DICT, dictionary, word[0].lower(), "%s.def" % word.lower())
-        if not os.path.exists(FILE_DEF):
-            cmd = "dict -C -d %s %s" % (dictionary, word)
-            defs, error = execmd(cmd)
-            if ERR_DEF_NOT_FOUND in error:
-                # ~ self.log.warning("[ - ] Word '%s': definitions not found in dictionary '%s'", word, dictionary)
-                defs = error
-            else:
-                pass
-                # ~ self.log.info("[ + ] Word '%s': definitions found in dictionary '%s'", word, dictionary)
-            os.makedirs(os.path.dirname(FILE_DEF), exist_ok=True)
-            with open(FILE_DEF, 'wb') as fd:
-                fd.write(defs)
-        else:
-            pass
-            # ~ self.log.debug("[ = ] Word '%s' from dictionary '%s' found in your Personal Dictionary", word, dictionary)
-        return FILE_DEF
+        return self.lookup_many([word], dictionary)[word]
+
+    def lookup_many(self, words, dictionary="fd-deu-eng"):
+        """
+        Look up many words at once. Words not yet in the Personal Dictionary
+        are defined through a single pipelined connection to dictd, or with
+        the 'dict' client if the server can not be reached. Words with
+        control characters (or a database with them) are not looked up (their definition is None).
+        Return a dictionary word -> definition.
+        """
+        known = self.store.known(dictionary, words)
+        missing = []
+        for word in words:
+            if word not in known and word not in missing and valid(word) and valid(dictionary):
+                missing.append(word)
+            # ~ else:
+                # ~ self.log.debug("[ = ] Word '%s' from dictionary '%s' found in your Personal Dictionary", word, dictionary)
+
+        if len(missing) > 0:
+            try:
+                results = self.pool.define_many(missing, dictionary)
+                defs = [format_definitions(word, definitions) for word, definitions in zip(missing, results)]
+            except (OSError, DictError) as error:
+                # ~ self.log.warning("Dictionary server not reachable (%s). Using dict client", error)
+                defs = [self.lookup_command(word, dictionary) for word in missing]
+            # ~ for word, definition in zip(missing, defs):
+                # ~ if ERR_DEF_NOT_FOUND in definition:
+                    # ~ self.log.warning("[ - ] Word '%s': definitions not found in dictionary '%s'", word, dictionary)
+            self.store.put_many(dictionary, zip(missing, defs))
+
+        definitions = {}
+        for word in words:
+            definitions[word] = self.store.get(dictionary, word)
+        return definitions
+
+    def lookup_command(self, word, dictionary):
+        """Fallback: define a word with the 'dict' command line client"""
+        defs, error = execmd(['dict', '-C', '-d', dictionary, word])
+        if ERR_DEF_NOT_FOUND in error:
+            defs = error
+        return defs
 
     def missing(self):
-        defs = []
-        nodefs = []
-        for dictionary in os.listdir(DIR_DICT):
-            DIR_PERS_DICT = os.path.join(DIR_DICT, dictionary)
-            for letter in os.listdir(DIR_PERS_DICT):
-                DIR_ENTRIES = os.path.join(DIR_PERS_DICT, letter)
-                for entry in os.listdir(DIR_ENTRIES):
-                    FILE_ENTRY = os.path.join(DIR_ENTRIES, entry)
-                    with open(os.path.abspath(FILE_ENTRY), 'rb') as fe:
-                        if ERR_DEF_NOT_FOUND in fe.read():
-                            # ~ self.log.warning("Definition missing in dictionary '%s' for word '%s'", dictionary, entry)
-                            nodefs.append(FILE_ENTRY)
-                        else:
-                            defs.append(FILE_ENTRY)
-
+        """Return the (dictionary, word) entries with and without definitions"""
+        defs = self.store.entries(found=True)
+        nodefs = self.store.entries(found=False)
+        # ~ for dictionary, word in nodefs:
+            # ~ self.log.warning("Definition missing in dictionary '%s' for word '%s'", dictionary, word)
         return defs, nodefs
 
 # ~ pd = PersonalDictionary()
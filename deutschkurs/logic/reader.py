@@ -0,0 +1,64 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Reader module.
+
+# File: reader.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: read userdata files in bounded chunks
+"""
+
+from nltk.tokenize import sent_tokenize
+
+# Far below spaCy's default max_length (1.000.000 characters)
+CHUNK_SIZE = 100000
+
+
+def split_point(buffer, language='german'):
+    """
+    Return the position where buffer should be cut: after the last
+    paragraph, before the last (maybe incomplete) sentence, after the
+    last whitespace or, if none of them is found, at its end. Without
+    the punkt tokenizer data, sentences are not looked for.
+    """
+    half = len(buffer) // 2
+    pos = buffer.rfind('\n\n', half)
+    if pos >= 0:
+        return pos + 2
+
+    try:
+        sentences = sent_tokenize(buffer[half:], language=language)
+    except LookupError:
+        sentences = []
+    if len(sentences) > 1:
+        pos = buffer.rfind(sentences[-1])
+        if pos > 0:
+            return pos
+
+    for pos in range(len(buffer) - 1, half, -1):
+        if buffer[pos].isspace():
+            return pos + 1
+    return len(buffer)
+
+
+def read_chunks(filepath, chunk_size=CHUNK_SIZE, language='german'):
+    """
+    Yield the text of a file in chunks of about chunk_size characters,
+    split on paragraphs or sentences. At most two chunks are kept in
+    memory whatever the size of the file. An empty file yields one empty
+    chunk.
+    """
+    buffer = ''
+    empty = True
+    with open(filepath, 'r') as fin:
+        for block in iter(lambda: fin.read(chunk_size), ''):
+            buffer += block
+            if len(buffer) >= chunk_size:
+                cut = split_point(buffer, language)
+                empty = False
+                yield buffer[:cut]
+                buffer = buffer[cut:]
+    if len(buffer) > 0 or empty:
+        yield buffer
@@ -13,10 +13,11 @@ Server module.
 # Standard libraries
 import os
 import glob
-import json
 import pprint as pp
 import logging
 import subprocess
+import time
+import bisect
 
 import nltk # Natural Language Toolkit (https://www.nltk.org)
 from nltk.tokenize import sent_tokenize, word_tokenize
@@ -24,25 +25,32 @@ from nltk.tokenize import sent_tokenize, word_tokenize
 import duden # python module which can provide various information about given german word
 # ~ from demorphy import Analyzer # DEMorphy is a morphological analyzer for German language (https://github.com/DuyguA/DEMorphy)
 # ~ from demorphy.tagset import ParsedResult
-import spacy # spaCy is library for advanced Natural Language Processing in Python (https://spacy.io)
-
-try:
-    # ~ msg.debug("Loading German corpus")
-    # ~ nlp = spacy.load("de_core_news_lg")
-    nlp = spacy.load("de_dep_news_trf")
-except:
-    # ~ msg.error("German corpus not found. Download it manually:")
-    # ~ msg.info("python3 -m spacy download de_dep_news_trf")
-    # python3 -m spacy download de_core_news_sm
-    exit(-1)
 
 
 from kb4it.services.builder import KB4ITBuilder
 
+from manifest import Manifest
+from cachestore import CacheStore, CacheStoreError
+from language import load_model, nlp_exclude, explain_pos, extract_words, LanguageModelError
+from dudenlookup import DudenResolver, FOUND, MISSING, CACHED
+from util import atomic_write, run_parallel, ParallelError
+from wordindex import first_letter, dictionary_record
+from wordrecord import WordRecord
+from metrics import Metrics
+from reader import read_chunks, CHUNK_SIZE
+from tplcache import TemplateCache
+from memo import Memo
+from bundle import import_bundle, BundleError
+
 TITLE = "= %s\n\n"
 PROP = ":%s:\t\t%s\n"
 EOHMARK = "// END-OF-HEADER. DO NOT MODIFY OR DELETE THIS LINE\n\n"
 BODY = "%s"
+WORD_PAGES_BATCH = 500
+
+# Cache database path -> (store, cache, index) kept loaded between the
+# builds of a process (see watch.py)
+RESIDENT = {}
 
 
 class Theme(KB4ITBuilder):
@@ -50,44 +58,135 @@ class Theme(KB4ITBuilder):
     cache = {}
     stats = {}
     nlp = None
+    manifest = None
+    store = None
+    index = None
+    metrics = None
+    tplcache = None
+    memo = None
     # ~ pd = PersonalDictionary()
 
     def clean_sources_dir(self):
-        sources = glob.glob(os.path.join(self.envvars['DIRS']['ROOT'], '*.adoc'))
+        """Delete the pages of words no longer in the cache"""
+        deleted = 0
+        sources = glob.glob(os.path.join(self.envvars['DIRS']['ROOT'], 'word_*.adoc'))
         for adoc in sources:
-            os.unlink(adoc)
+            word = os.path.basename(adoc)[5:-5]
+            if word not in self.cache['words']:
+                os.unlink(adoc)
+                deleted += 1
+        return deleted
 
     def generate_sources(self):
         logging.getLogger("urllib3").setLevel(logging.WARNING)
+        self.metrics = Metrics()
         self.check_environment()
         self.initialize_environment()
-        self.clean_sources_dir()
-        self.analyze_userdata()
-        for word in self.cache['words']:
-            self.create_page_word(word)
+        with self.metrics.phase('analysis'):
+            self.analyze_userdata()
+        with self.metrics.phase('word_pages'):
+            deleted = self.clean_sources_dir()
+            # Mostly reading and writing files: batches run in threads
+            words = sorted(self.cache['words'])
+            tasks = []
+            for start in range(0, len(words), WORD_PAGES_BATCH):
+                batch = words[start:start + WORD_PAGES_BATCH]
+                tasks.append(("word pages from '%s'" % batch[0], self.create_pages_word, (batch,)))
+            try:
+                written = sum(run_parallel(tasks, self.get_workers()))
+            except ParallelError as error:
+                for name, exc in error.errors:
+                    self.log.error("[PAGES] - %s: %s", name, exc)
+                raise
+        self.metrics.count('pages_written', written)
+        self.metrics.count('pages_skipped', len(self.cache['words']) - written)
+        self.metrics.count('pages_deleted', deleted)
+        self.log.info("Word pages: %d written, %d unchanged, %d deleted", written, len(self.cache['words']) - written, deleted)
 
 
     def build(self):
         """Create standard pages for default theme"""
-        self.create_page_dictionary()
-        self.create_page_topics()
-        self.create_page_pos()
-        self.create_page_grammar()
-        self.create_page_index()
-        self.create_page_about_app()
-        self.create_page_about_theme()
-        self.create_page_about_kb4it()
-        self.create_page_help()
-
+        if self.metrics is None:
+            self.metrics = Metrics()
+        pages = [
+            ('page_dictionary', self.create_page_dictionary),
+            ('page_topics', self.create_page_topics),
+            ('page_pos', self.create_page_pos),
+            ('page_grammar', self.create_page_grammar),
+            ('page_index', self.create_page_index),
+            ('page_about_app', self.create_page_about_app),
+            ('page_about_theme', self.create_page_about_theme),
+            ('page_about_kb4it', self.create_page_about_kb4it),
+            ('page_help', self.create_page_help),
+        ]
+        # Rendering is CPU bound: threads would only contend for the GIL
+        try:
+            for name, create_page in pages:
+                with self.metrics.phase(name):
+                    create_page()
+        finally:
+            self.count_templates()
+            self.save_aggregates()
+            self.create_page_performance()
+            self.save_report()
+
+    def template(self, name):
+        """Theme templates are compiled once and cached on disk"""
+        if self.tplcache is not None:
+            template = self.tplcache.get(name)
+            if template is not None:
+                return template
+        return super().template(name)
+
+    def finalize(self):
+        """Keep the cache loaded for the next build of this process"""
+        super().finalize()
+        if self.store is not None:
+            RESIDENT[self.store.path] = (self.store, self.cache, self.index)
+
+    def get_config(self, key, default=None):
+        """Return a theme setting from theme.adoc or default"""
+        try:
+            return self.srvapp.get_theme_properties()[key]
+        except (KeyError, TypeError):
+            return default
+
+    def get_workers(self):
+        """Number of threads writing word pages (0: one per CPU)"""
+        workers = self.get_config('workers', 0)
+        if workers < 1:
+            workers = os.cpu_count() or 1
+        return workers
+
+    def get_word_key(self):
+        """Words are keyed by their 'text' (default) or their 'lemma'"""
+        return self.get_config('word_key', 'text')
+
+    def get_nlp(self):
+        """Load the spaCy model on first use. Return None if unavailable"""
+        if self.nlp is None:
+            model = self.get_config('nlp_model', 'trf')
+            try:
+                self.nlp, elapsed = load_model(model, nlp_exclude(self.get_word_key()))
+            except LanguageModelError as error:
+                self.log.error("[NLP] - %s", error)
+                return None
+            self.metrics.add_time('nlp_load', elapsed)
+            self.stats['nlp_model'] = model
+            self.stats['nlp_load_time'] = elapsed
+            self.log.info("[NLP] - Model '%s' loaded in %.2fs (pipeline: %s)", model, elapsed, ', '.join(self.nlp.pipe_names))
+        return self.nlp
 
     def check_environment(self):
-        try:
-            nltk.data.find('tokenizers/punkt')
-            self.log.debug("[CHECKS] - Tokenizer Punkt found!")
-        except LookupError as error:
-            self.log.warning("[CHECKS] - Tokenizer Punkt not found! Downloading...")
-            nltk.download('punkt')
-            self.log.info("[SETUP] - Tokenizer Punkt for NLTK downloaded")
+        # nltk >= 3.9 loads the Punkt tokenizer from 'punkt_tab'
+        for resource in ['punkt', 'punkt_tab']:
+            try:
+                nltk.data.find('tokenizers/%s' % resource)
+                self.log.debug("[CHECKS] - Tokenizer %s found!", resource)
+            except LookupError as error:
+                self.log.warning("[CHECKS] - Tokenizer %s not found! Downloading...", resource)
+                nltk.download(resource)
+                self.log.info("[SETUP] - Tokenizer %s for NLTK downloaded", resource)
 
         self.envvars['DIRS'] = {}
         self.envvars['FILE'] = {}
@@ -127,45 +226,395 @@ class Theme(KB4ITBuilder):
                             Grüße"""
                 fout.write(sentences)
 
-        # Global cache for words
+        # Global cache for words (cache.json is only read for migration)
         FILE_CACHE = os.path.join(self.envvars['DIRS']['CACHE'], 'cache.json')
         self.envvars['FILE']['CACHE'] = FILE_CACHE
+        FILE_CACHE_DB = os.path.join(self.envvars['DIRS']['CACHE'], 'cache.db')
+        self.envvars['FILE']['CACHE_DB'] = FILE_CACHE_DB
+
+        # Manifest of userdata files already analyzed
+        FILE_MANIFEST = os.path.join(self.envvars['DIRS']['CACHE'], 'manifest.json')
+        self.envvars['FILE']['MANIFEST'] = FILE_MANIFEST
+
+        # Bundle imported into an empty cache (see bundle.py)
+        FILE_BUNDLE = os.path.join(self.envvars['DIRS']['CACHE'], 'bundle.jsonl.gz')
+        self.envvars['FILE']['BUNDLE'] = FILE_BUNDLE
+
+        # Aggregates of the last build (see Memo)
+        FILE_AGGREGATES = os.path.join(self.envvars['DIRS']['CACHE'], 'aggregates.json')
+        self.envvars['FILE']['AGGREGATES'] = FILE_AGGREGATES
+
+        # Compiled templates
+        self.envvars['DIRS']['TEMPLATES'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'templates')
+        self.envvars['DIRS']['TEMPLATES_CACHE'] = os.path.join(self.envvars['DIRS']['CACHE'], 'templates')
 
     def initialize_environment(self):
+        self.load_templates()
         self.load_global_cache()
+        self.manifest = Manifest(self.envvars['FILE']['MANIFEST'])
+        n = self.manifest.load()
+        if n > 0 and self.store.is_empty():
+            # Nothing to retract from: analyze everything again
+            self.manifest.files = {}
+            self.log.warning("Empty cache: manifest discarded")
+        self.log.debug("Manifest loaded: %d files", n)
+        self.warm_up()
+        self.migrate_word_keys()
+        self.memo = Memo(self.envvars['FILE']['AGGREGATES'])
+        n = self.memo.load(self.aggregates_version())
+        self.log.debug("Aggregates loaded: %d", n)
+
+    def warm_up(self):
+        """Start an empty cache from the bundle exported elsewhere, if any"""
+        FILE_BUNDLE = self.envvars['FILE']['BUNDLE']
+        if not self.store.is_empty() or not os.path.exists(FILE_BUNDLE):
+            return
+        with self.metrics.phase('bundle_import'):
+            try:
+                counts = import_bundle(FILE_BUNDLE, self.store, self.manifest)
+            except (BundleError, OSError) as error:
+                self.log.error("[CACHE] - Bundle %s not imported: %s", FILE_BUNDLE, error)
+                return
+            self.cache = self.store.load()
+            self.index = self.store.load_index(self.cache['words'])
+        self.log.info("[CACHE] - Imported %d entries and %d files from %s", counts['entry'], counts['file'], FILE_BUNDLE)
+
+    def migrate_word_keys(self):
+        """
+        Re-key the cache when the word_key setting changes.
+
+        Words can not be lemmatized without their context, so all userdata
+        is analyzed again. Duden data of the old entries is kept in the
+        'legacy' section of the store and reused for the new keys, so it
+        is not fetched again. It is dropped once all userdata is analyzed.
+        """
+        mode = self.get_word_key()
+        if self.store.is_empty():
+            self.store.set_meta('word_key', mode)
+            return
+        previous = self.store.get_meta('word_key', 'text')
+        if previous == mode:
+            return
+        if self.get_nlp() is None:
+            # Nothing could be analyzed again: keep the cache as it is
+            self.log.error("[CACHE] - Words keyed by %s, now by %s: migration postponed until the model loads", previous, mode)
+            return
+
+        self.log.warning("[CACHE] - Words keyed by %s, now by %s: analyzing all userdata again", previous, mode)
+        # Reset first: if interrupted before the commit, it starts over
+        self.manifest.files = {}
+        self.manifest.save()
+        legacy = self.cache['legacy']
+        for key, entry in self.cache['words'].items():
+            if entry.extra is not None:
+                legacy[key] = dict((k, v) for k, v in entry.items() if k not in ['part_of_speech', 'topic', 'forms'])
+                self.store.touch('legacy', key)
+            self.index.remove_word(key, entry)
+            self.store.touch('words', key)
+        self.metrics.count('words_migrated', len(self.cache['words']))
+        self.cache['words'] = {}
+        for key in self.cache['duden_pending']:
+            self.store.touch('duden_pending', key)
+        self.cache['duden_pending'] = {}
+        # Committed along with the words it replaces
+        self.store.set_meta('word_key', mode)
+        self.save_global_cache()
+
+    def drop_legacy(self):
+        """Forget the Duden data kept by a word_key migration"""
+        for key in self.cache['legacy']:
+            self.store.touch('legacy', key)
+        self.log.info("[CACHE] - Migration done: %d legacy entries dropped", len(self.cache['legacy']))
+        self.cache['legacy'] = {}
+        self.save_global_cache()
+
+    def load_templates(self):
+        """Compile new or changed templates before any page is rendered"""
+        with self.metrics.phase('templates_warm'):
+            self.tplcache = TemplateCache(self.envvars['DIRS']['TEMPLATES'], self.envvars['DIRS']['TEMPLATES_CACHE'])
+            removed = self.tplcache.warm()
+        self.log.debug("[TEMPLATES] - %d compiled (%d new), %d stale modules deleted", len(self.tplcache.templates), self.tplcache.misses, removed)
+
+    def aggregate(self, name, compute, persist=False):
+        """
+        Return a value derived from the words cache, computed only once
+        until the cache changes. Persistent values are reused by the next
+        build if nothing changed in between.
+        """
+        if self.memo is None:
+            return compute()
+        self.memo.reset(self.aggregates_version())
+        return self.memo.get(name, compute, persist)
+
+    def aggregates_version(self):
+        """
+        Aggregates depend on the words cache and, as some are rendered
+        (eg.: tagclouds), on the templates too
+        """
+        if self.tplcache is None:
+            return str(self.store.version())
+        return "%s-%s" % (self.store.version(), self.tplcache.digest())
+
+    def save_aggregates(self):
+        if self.memo is None:
+            return
+        self.memo.save()
+        self.metrics.count('aggregate_hits', self.memo.hits)
+        self.metrics.count('aggregate_misses', self.memo.misses)
+
+    def tagcloud(self, key):
+        return self.aggregate('tagcloud-%s' % key, lambda: self.create_tagcloud_from_key(key), persist=True)
+
+    def count_templates(self):
+        if self.tplcache is None:
+            return
+        self.metrics.count('template_hits', self.tplcache.hits)
+        self.metrics.count('template_misses', self.tplcache.misses)
+        self.log.info("[TEMPLATES] - Cache hit rate: %.1f%%", self.tplcache.hit_rate() * 100)
 
     def analyze_userdata(self):
-        for topic in os.listdir(self.envvars['DIRS']['USERDATA']):
+        """
+        Analyze only new or changed userdata files and retract deleted ones.
+        Return the keys of the words which may have changed.
+        """
+        USERDATA = self.envvars['DIRS']['USERDATA']
+        changed, deleted, unchanged = self.manifest.scan(USERDATA)
+        self.log.info("Userdata: %d files changed, %d deleted, %d unchanged", len(changed), len(deleted), unchanged)
+
+        postponed = len(changed) > 0 and self.get_nlp() is None
+        if postponed:
+            # Changed files stay pending in the manifest for the next build
+            self.log.error("[NLP] - %d changed files can not be analyzed", len(changed))
+            changed = []
+
+        # Contributions of deleted or modified files are retracted once
+        # the new ones are known
+        retracted = []
+        affected = set()
+        for relpath in deleted:
+            entry = self.manifest.remove(relpath)
+            retracted.append(entry)
+            self.log.info("Topic[%s] - File[%s] deleted", entry['topic'], relpath)
+        for relpath, topic, filepath, stat, digest in changed:
+            entry = self.manifest.remove(relpath)
+            if entry is not None:
+                retracted.append(entry)
+
+        # All files are streamed in chunks through nlp.pipe and merged in
+        # order. A file is done when the first chunk of the next one shows up
+        chunk_size = self.get_config('nlp_chunk_size', CHUNK_SIZE)
+
+        def texts():
+            for n, (relpath, topic, filepath, stat, digest) in enumerate(changed):
+                self.log.info("Topic[%s] - File[%s]", topic, os.path.basename(filepath))
+                for chunk in read_chunks(filepath, chunk_size):
+                    yield chunk, n
+
+        def add_file(n, words):
+            relpath, topic, filepath, stat, digest = changed[n]
+            self.metrics.count('files_analyzed')
             if not topic in self.cache['topics']:
                 self.cache['topics'][topic] = []
-            topicpath = os.path.join(self.envvars['DIRS']['USERDATA'], topic)
-            try:
-                for filename in os.listdir(topicpath):
-                    filepath = os.path.join(topicpath, filename)
-                    self.log.info("Topic[%s] - File[%s]", topic, filename)
-                    text = open(filepath, 'r').read()
-                    self.analyze_text(topic, text)
-            except NotADirectoryError:
-                continue
+                self.store.touch('topics', topic)
+            self.manifest.update(relpath, topic, stat, digest, words)
+            affected.update(words)
+            self.save_global_cache()
+
+        if len(changed) > 0:
+            docs = self.get_nlp().pipe(texts(), as_tuples=True,
+                                       batch_size=self.get_config('nlp_batch_size', 64),
+                                       n_process=self.get_config('nlp_n_process', 1))
+            current = 0
+            words = set()
+            start = time.perf_counter()
+            for doc, n in docs:
+                self.metrics.add_time('nlp_parse', time.perf_counter() - start)
+                if n != current:
+                    add_file(current, words)
+                    current = n
+                    words = set()
+                topic = changed[n][1]
+                words.update(self.analyze_doc(topic, doc))
+                self.metrics.count('chunks_analyzed')
+                start = time.perf_counter()
+            add_file(current, words)
+
+        if len(retracted) > 0:
+            for entry in retracted:
+                affected.update(entry['words'])
+            self.retract_contributions(retracted)
+
+        if len(self.cache['duden_pending']) > 0 or len(self.cache['duden_misses']) > 0:
+            with self.metrics.phase('duden'):
+                affected.update(self.resolve_nouns())
+
+        self.save_global_cache()
+        if len(changed) > 0 or len(deleted) > 0:
+            self.manifest.save()
+        if len(self.cache['legacy']) > 0 and not postponed:
+            # The manifest is complete again
+            self.drop_legacy()
         self.create_stats()
+        return affected
+
+    def retract_contributions(self, entries):
+        """Remove topics and words no longer backed by any userdata file"""
+        contributions = self.manifest.contributions()
+        for entry in entries:
+            topic = entry['topic']
+            for key in entry['words']:
+                try:
+                    word = self.cache['words'][key]
+                except KeyError:
+                    continue
+                topics = contributions.get(key, set())
+                if topic in topics:
+                    continue
+                topics = word['topic']
+                if topic in topics:
+                    topics.remove(topic)
+                    word['topic'] = topics
+                    self.index.remove('topic', topic, key)
+                    self.store.touch('words', key)
+                if len(word['topic']) == 0:
+                    self.store.touch('words', key)
+                    self.index.remove_word(key, word)
+                    del(self.cache['words'][key])
+                    self.log.info("[ x ] Word '%s' removed from global cache", key)
+
+        # Topics without files left
+        topics = self.manifest.topics()
+        for topic in list(self.cache['topics'].keys()):
+            if topic not in topics:
+                del(self.cache['topics'][topic])
+                self.store.touch('topics', topic)
 
     def load_global_cache(self):
-        try:
-            with open(self.envvars['FILE']['CACHE'], 'r') as fc:
-                self.cache = json.load(fc)
-                self.log.debug("Global cache loaded: %d words", len(self.cache['words']))
-        except:
-            self.cache = {}
-            self.cache['words'] = {}
-            self.cache['topics'] = {}
-            with open(self.envvars['FILE']['CACHE'], 'w') as fc:
-                json.dump(self.cache, fc)
-                # ~ self.log.debug("Words cache created")
+        FILE_CACHE = self.envvars['FILE']['CACHE']
+        FILE_CACHE_DB = self.envvars['FILE']['CACHE_DB']
+        resident = RESIDENT.pop(FILE_CACHE_DB, None)
+        if self.store is None and resident is not None:
+            if resident[0].is_current():
+                self.store, self.cache, self.index = resident
+                self.log.debug("Global cache reused: %d words", len(self.cache['words']))
+                return
+            resident[0].close()
+
+        if self.store is None:
+            self.store = CacheStore(FILE_CACHE_DB)
+            try:
+                self.store.open()
+            except CacheStoreError as error:
+                # Keep the damaged database aside instead of dropping it
+                self.log.error("[CACHE] - %s", error)
+                self.store.close()
+                os.replace(FILE_CACHE_DB, "%s.corrupt" % FILE_CACHE_DB)
+                self.log.error("[CACHE] - Damaged cache moved to %s.corrupt", FILE_CACHE_DB)
+                self.store.open()
+
+            if self.store.is_empty() and os.path.exists(FILE_CACHE):
+                try:
+                    n = self.store.migrate(FILE_CACHE)
+                    self.log.info("[CACHE] - Migrated %d words from %s", n, FILE_CACHE)
+                except ValueError as error:
+                    self.log.error("[CACHE] - Legacy cache '%s' unreadable: %s", FILE_CACHE, error)
+                    os.replace(FILE_CACHE, "%s.corrupt" % FILE_CACHE)
+
+        self.cache = self.store.load()
+        self.index = self.store.load_index(self.cache['words'])
+        self.log.debug("Global cache loaded: %d words", len(self.cache['words']))
 
     def save_global_cache(self):
-        with open(self.envvars['FILE']['CACHE'], 'w') as fc:
-            json.dump(self.cache, fc)
-            # ~ self.log.debug("Words cache saved")
+        with self.metrics.phase('cache_save'):
+            nbytes = self.store.commit(self.cache, self.index)
+        self.metrics.count('cache_bytes_written', nbytes)
+        # ~ self.log.debug("Words cache saved")
+
+    def resolve_nouns(self):
+        """
+        Look up in Duden all nouns pending since the last builds and those
+        Duden did not know more than 'duden_negative_ttl' days ago. Return
+        the keys looked up.
+        """
+        now = time.time()
+        ttl = self.get_config('duden_negative_ttl', 30) * 86400
+        pending = self.cache['duden_pending']
+        misses = self.cache['duden_misses']
+        for key, when in list(misses.items()):
+            if key in self.cache['words'] and now - when < ttl:
+                continue
+            # Expired (asked again) or retracted in the meantime
+            del(misses[key])
+            self.store.touch('duden_misses', key)
+            if key in self.cache['words']:
+                pending[key] = self.cache['words'][key].get('title', key)
+                self.store.touch('duden_pending', key)
+                self.metrics.count('duden_requeued')
+
+        words = {}
+        for key in list(pending.keys()):
+            if key not in self.cache['words']:
+                # Retracted in the meantime
+                del(pending[key])
+                self.store.touch('duden_pending', key)
+            else:
+                words[key] = pending[key]
+        if len(words) == 0:
+            return []
+
+        offline = self.get_config('duden_offline', False)
+        resolver = DudenResolver(self.get_duden_dict,
+                                 workers=self.get_config('duden_workers', 4),
+                                 rate=self.get_config('duden_rate', 2.0),
+                                 retries=self.get_config('duden_retries', 3),
+                                 backoff=self.get_config('duden_backoff', 1.0),
+                                 offline=offline,
+                                 misses=misses,
+                                 ttl=ttl)
+        results = resolver.resolve(words)
+        self.metrics.sample('duden_latency', resolver.latencies)
+        resolved = 0
+        for key, (status, value) in sorted(results.items()):
+            if status == CACHED:
+                # Left to its miss, which queues it again once expired
+                self.log.debug("[ - ] Word '%s' unknown to Duden (cached)", key)
+                self.metrics.count('duden_negative_hits')
+            else:
+                self.metrics.count('duden_%s' % status)
+            if status == FOUND:
+                self.merge_duden_dict(key, value)
+                resolved += 1
+            elif status == MISSING:
+                misses[key] = now
+                self.store.touch('duden_misses', key)
+                resolved += 1
+            elif status != CACHED:
+                self.log.error("[ ! ] Word '%s' could not be looked up: %s", key, value)
+                continue
+            del(pending[key])
+            self.store.touch('duden_pending', key)
+        if offline:
+            self.log.warning("[DUDEN] - Offline mode: %d nouns left pending", len(pending))
+        self.log.info("[DUDEN] - %d nouns resolved, %d left pending", resolved, len(pending))
+        return list(words)
+
+    def merge_duden_dict(self, key, ddict):
+        """Add the Duden export to a word, keeping its POS and topics"""
+        entry = self.cache['words'][key]
+        pos = entry['part_of_speech']
+        topics = entry['topic']
+        for k in ddict:
+            entry[k] = ddict[k]
+        entry['part_of_speech'] = pos
+        entry['topic'] = topics
+        self.store.touch('words', key)
+
+    def merge_legacy_dict(self, key):
+        """Reuse the Duden data of a word cached before a migration"""
+        entry = self.cache['words'][key]
+        for k, value in self.cache['legacy'][key].items():
+            entry[k] = value
+        self.metrics.count('duden_reused')
 
     def get_duden_dict(self, word):
         self.log.debug("Looking for: %s", word)
@@ -193,63 +642,59 @@ class Theme(KB4ITBuilder):
                 ddict = None
         return ddict
 
-    def is_word(self, word):
-        # "16.02.2021." is detected as a ADJ??
-        ans = True
-        for letter in word:
-            ans = ans and not letter.isdigit()
-        return ans
+    def analyze_doc(self, topic, doc):
+        """Add the words of a spaCy doc to the cache and return their keys"""
+        keys = set()
+
+        self.log.debug("Analyzing %d tokens", len(doc))
+        self.metrics.count('tokens', len(doc))
+        by_lemma = self.get_word_key() == 'lemma'
+        for key, (text, pos, forms) in extract_words(doc, by_lemma).items():
+            # ~ self.log.debug("%s -> %s (%s)", key, pos, spacy.explain(pos))
+            # Only new or modified words are written back to the store
+            changed = key not in self.cache['words']
+            if changed:
+                self.metrics.count('words_new')
+                self.cache['words'][key] = WordRecord(key)
+                self.cache['words'][key]['title'] = text
+
+                # If substantive, get genre from duden once the
+                # analysis is over (see resolve_nouns)
+                if pos == 'NOUN':
+                    if key in self.cache['legacy']:
+                        self.merge_legacy_dict(key)
+                    else:
+                        self.cache['duden_pending'][key] = text
+                        self.store.touch('duden_pending', key)
 
-    def analyze_text(self, topic, text):
-        words = set()
-
-        self.load_global_cache()
-
-        self.log.debug("Analyzing %d words", len(words))
-        doc = nlp(text)
-        for word in doc:
-            # ~ print(dir(word))
-            # ~ print(word.lemma_)
-            # ~ print(word.norm_)
-            # ~ print(word.prefix_)
-            # ~ print(word.sent)
-            # ~ print(word.tag_)
-            # ~ print(word.text)
-            # ~ print(word.text_with_ws)
-            # ~ print(word.vocab)
-
-            if not word.pos_ in ['PUNCT', 'SPACE', 'NUM'] and self.is_word(word.text):
-                key = word.text.lower()
-                # ~ self.log.debug("%s -> %s (%s)", key, word.pos_, spacy.explain(word.pos_))
-                if key not in self.cache['words']:
-                    self.cache['words'][key] = {}
-                    self.cache['words'][key]['title'] = word.text
-                    # ~ self.cache['words'][key]['part_of_speech'] = spacy.explain(word.pos_).title()
-
-                    # If substantive, get genre from duden
-                    if word.pos_ == 'NOUN':
-                        ddict = self.get_duden_dict(word.text)
-                        if ddict is not None:
-                            for k in ddict:
-                                self.cache['words'][key][k] = ddict[k]
-
-                    try:
-                        article = self.cache['words'][key]['article']
-                    except:
-                        self.cache['words'][key]['article'] = ''
-                    self.cache['words'][key]['part_of_speech'] = spacy.explain(word.pos_).title()
-
-
-                    #topics
-                    try:
-                        topics = self.cache['words'][key]['topic']
-                        if not topic in topics:
-                            topics.append(topic)
-                        self.cache['words'][key]['topic'] = sorted(topics)
-                    except:
-                        self.cache['words'][key]['topic'] = [topic]
-
-            self.save_global_cache()
+                try:
+                    article = self.cache['words'][key]['article']
+                except:
+                    self.cache['words'][key]['article'] = ''
+                self.cache['words'][key]['part_of_speech'] = explain_pos(pos)
+                self.index.add('letter', first_letter(key), key)
+                self.index.add('pos', self.cache['words'][key]['part_of_speech'], key)
+
+            # Inflected forms found for a lemma
+            if by_lemma:
+                known = self.cache['words'][key].setdefault('forms', [])
+                for form in forms:
+                    if form != key and form not in known:
+                        bisect.insort(known, form)
+                        changed = True
+
+            #topics
+            topics = self.cache['words'][key]['topic']
+            if not topic in topics:
+                topics.append(topic)
+                self.cache['words'][key]['topic'] = sorted(topics)
+                changed = True
+            self.index.add('topic', topic, key)
+            keys.add(key)
+            if changed:
+                self.store.touch('words', key)
+
+        return keys
 
 
     # ~ def analyze_text(self, topic, text):
@@ -314,31 +759,15 @@ class Theme(KB4ITBuilder):
             # ~ self.save_global_cache()
 
     def create_stats(self):
-        self.stats['len_words'] = len(self.cache['words'])
-        self.stats['topics'] = {}
-        self.stats['len_topics'] = 0
-        self.stats['pos'] = {}
-        for word in self.cache['words']:
-            # topics
-            for topic in self.cache['words'][word]['topic']:
-                try:
-                    n = self.stats['topics'][topic]
-                    n += 1
-                    self.stats['topics'][topic] = n
-                except:
-                    self.stats['topics'][topic] = 1
-
-            # Part of speech
-            pos = self.cache['words'][word]['part_of_speech']
-            try:
-                n = self.stats['pos'][pos]
-                n += 1
-                self.stats['pos'][pos] = n
-            except:
-                self.stats['pos'][pos] = 1
-
-        self.stats['len_topics'] = len(self.stats['topics'])
-        self.stats['len_pos'] = len(self.stats['pos'])
+        def compute():
+            stats = {}
+            stats['len_words'] = len(self.cache['words'])
+            stats['topics'] = self.index.counts('topic')
+            stats['pos'] = self.index.counts('pos')
+            stats['len_topics'] = len(stats['topics'])
+            stats['len_pos'] = len(stats['pos'])
+            return stats
+        self.stats.update(self.aggregate('stats', compute, persist=True))
 
     def create_page_index(self):
         var = {}
@@ -347,55 +776,93 @@ class Theme(KB4ITBuilder):
         self.distribute('index', TPL_INDEX.render(var=var))
 
     def create_page_dictionary(self):
+        """
+        Create the dictionary page and the pages of all letters. Letters are
+        split in pages of 'dictionary_page_size' words (dictionary-A-1,
+        dictionary-A-2, ...). Return the names of the pages.
+        """
         TPL_DICTIONARY = self.template('PAGE_DICTIONARY')
         TPL_DICTIONARY_LETTER = self.template('PAGE_DICTIONARY_LETTER')
+        size = max(1, self.get_config('dictionary_page_size', 500))
 
-        # Get all letters
-        letters = set()
-        for word in self.cache['words']:
-            letters.add(word[0].upper())
+        # Get all letters from the index
+        letters = self.aggregate('letters', lambda: self.index.terms('letter'), persist=True)
 
         var = {}
         var['title'] = 'Dictionary'
-        var['letters'] = sorted(list(letters))
-        var['topics'] = self.create_tagcloud_from_key('Topic')
-        var['pos'] = self.create_tagcloud_from_key('Part Of Speech')
+        var['letters'] = letters
+        var['topics'] = self.tagcloud('Topic')
+        var['pos'] = self.tagcloud('Part Of Speech')
         # ~ self.log.error("TOPICS: %s", var['topics'])
         var['stats'] = self.stats
         self.distribute('dictionary', TPL_DICTIONARY.render(var=var))
 
-        for letter in letters:
+        def letter_words(letter):
+            return self.aggregate('words-%s' % letter, lambda: sorted(self.index.words('letter', letter)))
+
+        def render_letter(letter, num, count):
+            words = letter_words(letter)
             var = {}
-            dictionary = {}
             var['title'] = 'Dictionary'
-            for word in self.cache['words']:
-                wfl = word[0].upper()
-                if wfl == letter:
-                    try:
-                        words = dictionary[letter]
-                        words.append(word)
-                        dictionary[letter] = sorted(words)
-                    except:
-                        dictionary[letter] = [word]
-
-            var['letters'] = sorted(list(letters))
-            var['dictionary'] = dictionary
-            var['cache'] = self.cache
+            var['letters'] = letters
+            var['records'] = [dictionary_record(word, self.cache['words'][word]) for word in words[(num - 1) * size:num * size]]
             var['letter-active'] = letter
-            self.distribute('dictionary-%s' % letter, TPL_DICTIONARY_LETTER.render(var=var))
+            var['pagination'] = self.render_pagination(letter, num, count, size, len(words))
+            return TPL_DICTIONARY_LETTER.render(var=var)
+
+        names = ['dictionary']
+        for letter in letters:
+            count = (len(letter_words(letter)) + size - 1) // size
+            for num in range(1, count + 1):
+                name = "dictionary-%s-%d" % (letter, num)
+                self.distribute(name, render_letter(letter, num, count))
+                names.append(name)
+        return names
+
+    def render_pagination(self, letter, num, count, size, total):
+        """Return the links to the pages of a letter"""
+        if count < 2:
+            return self.template('PAGINATION_NONE').render()
+        TPL_ACTIVE = self.template('PAGINATION_PAGE_ACTIVE')
+        TPL_INACTIVE = self.template('PAGINATION_PAGE_INACTIVE')
+        items = []
+        for page in range(1, count + 1):
+            var = {}
+            var['page_num'] = page
+            var['page_start'] = (page - 1) * size + 1
+            var['page_end'] = min(page * size, total)
+            var['page_count_docs'] = total
+            var['page_link'] = "dictionary-%s-%d.html" % (letter, page)
+            if page == num:
+                items.append(TPL_ACTIVE.render(var=var))
+            else:
+                items.append(TPL_INACTIVE.render(var=var))
+        return ''.join(items)
+
+    def create_page_performance(self):
+        TPL_PERFORMANCE = self.template('PAGE_PERFORMANCE')
+        var = {}
+        var['title'] = 'Build performance'
+        var['report'] = self.metrics.report()
+        self.distribute('performance', TPL_PERFORMANCE.render(var=var))
+
+    def save_report(self):
+        DIR_REPORTS = os.path.join(self.envvars['DIRS']['CACHE'], 'reports')
+        path = self.metrics.save(DIR_REPORTS)
+        self.log.info("[METRICS] - Build report saved in %s", path)
 
     def create_page_topics(self):
         TPL_TOPICS = self.template('PAGE_TOPICS')
         var = {}
         var['title'] = 'Topics'
-        var['topics'] = self.create_tagcloud_from_key('Topic')
+        var['topics'] = self.tagcloud('Topic')
         self.distribute('topics', TPL_TOPICS.render(var=var))
 
     def create_page_pos(self):
         TPL_POS = self.template('PAGE_POS')
         var = {}
         var['title'] = 'Parts of Speech'
-        var['pos'] = self.create_tagcloud_from_key('Part Of Speech')
+        var['pos'] = self.tagcloud('Part Of Speech')
         self.distribute('pos', TPL_POS.render(var=var))
 
     def create_page_grammar(self):
@@ -410,18 +877,42 @@ class Theme(KB4ITBuilder):
         except:
             return ''
 
+    def render_page_word(self, word):
+        content = []
+        content.append(TITLE % self.cache['words'][word]['title'])
+        # ~ content.append(PROP % (cache['words'][word]['pos'], cache['words'][word]['word']))
+        content.append(self.build_property("Topic", ', '.join(self.cache['words'][word]['topic'])))
+        content.append(self.build_property("Part Of Speech", self.cache['words'][word]['part_of_speech']))
+        forms = self.cache['words'][word].get('forms', [])
+        if len(forms) > 0:
+            content.append(self.build_property("Forms", ', '.join(forms)))
+        # ~ content.append(self.build_property("Genre", self.cache['words'][word]['genre']))
+        content.append(EOHMARK)
+        # ~ content.append(BODY % self.cache['words'][word]['meaning_overview'])
+        return ''.join(content)
+
+    def create_pages_word(self, words):
+        """Create the pages of a batch of words. Return how many were written"""
+        written = 0
+        for word in words:
+            if self.create_page_word(word):
+                written += 1
+        return written
+
     def create_page_word(self, word):
+        """Write the page of a word only if its content changed"""
         # ~ self.log.info("Creating page for word: %s", self.cache['words'][word])
         doc_path = os.path.join(self.envvars['DIRS']['ROOT'], "word_%s.adoc" % word)
-        with open(doc_path, 'w') as fdp:
-            fdp.write(TITLE % self.cache['words'][word]['title'])
-            # ~ fdp.write(PROP % (cache['words'][word]['pos'], cache['words'][word]['word']))
-            fdp.write(self.build_property("Topic", ', '.join(self.cache['words'][word]['topic'])))
-            fdp.write(self.build_property("Part Of Speech", self.cache['words'][word]['part_of_speech']))
-            # ~ fdp.write(self.build_property("Genre", self.cache['words'][word]['genre']))
-            fdp.write(EOHMARK)
-            # ~ fdp.write(BODY % self.cache['words'][word]['meaning_overview'])
-            self.log.info("Page created for word: %s", word)
+        content = self.render_page_word(word)
+        try:
+            with open(doc_path, 'r') as fdp:
+                if fdp.read() == content:
+                    return False
+        except FileNotFoundError:
+            pass
+        atomic_write(doc_path, content)
+        self.log.debug("Page created for word: %s", word)
+        return True
 
     def create_page_about_app(self):
         var = {}
@@ -0,0 +1,96 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Template cache module.
+
+# File: tplcache.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: Mako templates compiled once and kept on disk
+"""
+
+import os
+import glob
+import hashlib
+import threading
+
+from mako.template import Template
+
+
+def content_digest(path):
+    with open(path, 'rb') as fin:
+        return hashlib.sha1(fin.read()).hexdigest()[:16]
+
+
+class TemplateCache:
+    """
+    Compiled Mako templates of a directory. Each template is compiled
+    to <cachedir>/<name>-<digest>.py, so a module is reused by every
+    build and process until the .tpl content changes.
+    """
+
+    def __init__(self, directory, cachedir):
+        self.directory = directory
+        self.cachedir = cachedir
+        self.templates = {}
+        self.digests = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(cachedir, exist_ok=True)
+
+    def names(self):
+        paths = glob.glob(os.path.join(self.directory, '*.tpl'))
+        return sorted(os.path.basename(path)[:-4] for path in paths)
+
+    def get(self, name):
+        """
+        Return the template or None if it is not in the directory. Hits
+        and misses count modules reused from or compiled to disk only.
+        """
+        with self.lock:
+            try:
+                return self.templates[name]
+            except KeyError:
+                pass
+
+        path = os.path.join(self.directory, "%s.tpl" % name)
+        if not os.path.exists(path):
+            return None
+        digest = content_digest(path)
+        module = os.path.join(self.cachedir, "%s-%s.py" % (name, digest))
+        compiled = os.path.exists(module)
+        template = Template(filename=path, module_filename=module)
+        with self.lock:
+            if compiled:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.templates[name] = template
+            self.digests[name] = digest
+        return template
+
+    def warm(self):
+        """Load every template and delete modules of old template versions"""
+        for name in self.names():
+            self.get(name)
+        current = set(os.path.basename(template.module.__file__) for template in self.templates.values())
+        removed = 0
+        for module in glob.glob(os.path.join(self.cachedir, '*.py')):
+            if os.path.basename(module) not in current:
+                os.unlink(module)
+                removed += 1
+        return removed
+
+    def digest(self):
+        """Return a digest of the contents of the templates loaded so far"""
+        with self.lock:
+            items = sorted(self.digests.items())
+        return hashlib.sha1(repr(items).encode('utf-8')).hexdigest()[:16]
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
@@ -13,6 +13,7 @@ Log module.
 import os
 import sys
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 
 def which(program):
@@ -42,6 +43,52 @@ def which(program):
     return None
 
 def execmd(cmd):
-    process = subprocess.Popen([cmd], shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    """
+    Run a command and return its (output, errors). A string is run by the
+    shell, a list of arguments is run directly.
+    """
+    if isinstance(cmd, str):
+        process = subprocess.Popen([cmd], shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    else:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     output, errors = process.communicate()
     return (output, errors)
+
+def atomic_write(path, content, mode='w'):
+    """Write content to a temporary file and move it over path"""
+    tmp = "%s.tmp" % path
+    with open(tmp, mode) as fout:
+        fout.write(content)
+    os.replace(tmp, path)
+
+
+class ParallelError(Exception):
+    """One or more tasks run by run_parallel failed"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        names = ', '.join(name for name, error in errors)
+        super().__init__("%d tasks failed: %s" % (len(errors), names))
+
+
+def run_parallel(tasks, workers):
+    """
+    Run a list of (name, function, args) in a pool of threads.
+
+    Return the results in the same order as the tasks. All tasks are run
+    even if some of them fail; failures are raised together afterwards
+    as a ParallelError holding a list of (name, exception).
+    """
+    results = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [(name, pool.submit(function, *args)) for name, function, args in tasks]
+        for name, future in futures:
+            try:
+                results.append(future.result())
+            except Exception as error:
+                errors.append((name, error))
+                results.append(None)
+    if len(errors) > 0:
+        raise ParallelError(errors)
+    return results
@@ -0,0 +1,110 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Watch module.
+
+# File: watch.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: build the site and build it again whenever userdata
+# changes, until interrupted (Ctrl+C). The spaCy model and the words
+# cache stay loaded between builds, only new or changed files are
+# analyzed and KB4IT only compiles the pages whose contents changed. The
+# change-to-page latencies are saved as a watch report next to the build
+# reports (resources/cache/reports). Usage:
+#   python3 watch.py <sources> <target> [-theme deutschkurs] [-log INFO]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from argparse import Namespace
+
+from kb4it.kb4it import KB4IT
+
+from watcher import Watcher
+from metrics import Metrics
+
+FILE_THEME = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'theme.adoc')
+
+
+def load_settings():
+    """Return the theme settings (watch_debounce, watch_interval, ...)"""
+    try:
+        with open(FILE_THEME, 'r') as fin:
+            return json.load(fin)
+    except (OSError, ValueError):
+        return {}
+
+
+def build(params):
+    """
+    Run a whole KB4IT build. Every build renders all the listings (eg.:
+    the dictionary pages of every letter) and KB4IT removes from the
+    target the pages not distributed anymore. Return the seconds it took.
+    """
+    start = time.perf_counter()
+    KB4IT(params).run()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a deutschkurs site and update it as userdata changes')
+    parser.add_argument('sources', help='KB4IT sources directory')
+    parser.add_argument('target', help='KB4IT target directory')
+    parser.add_argument('-theme', default='deutschkurs', help='KB4IT theme')
+    parser.add_argument('-log', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='Log level')
+    args = parser.parse_args()
+
+    params = Namespace()
+    params.RESET = False
+    params.FORCE = False
+    params.LOGLEVEL = args.log
+    params.SORT_ATTRIBUTE = None
+    params.SOURCE_PATH = os.path.abspath(args.sources)
+    params.TARGET_PATH = os.path.abspath(args.target)
+    params.THEME = args.theme
+    settings = load_settings()
+
+    print("Building %s" % params.TARGET_PATH)
+    elapsed = build(params)
+    print("Site built in %.2fs" % elapsed)
+
+    # The theme creates the userdata directory on the first build
+    USERDATA = os.path.join(params.SOURCE_PATH, 'resources', 'userdata')
+    DIR_REPORTS = os.path.join(params.SOURCE_PATH, 'resources', 'cache', 'reports')
+    metrics = Metrics()
+    watcher = Watcher(USERDATA,
+                      debounce=settings.get('watch_debounce', 1.0),
+                      interval=settings.get('watch_interval', 2.0))
+    print("Watching %s (%s). Press Ctrl+C to stop" % (USERDATA, watcher.backend))
+    try:
+        while True:
+            paths, detected = watcher.wait()
+            metrics.count('watch_files_changed', len(paths))
+            try:
+                elapsed = build(params)
+            except Exception as error:
+                # Keep watching: the next change may fix it
+                metrics.count('watch_build_errors')
+                metrics.save(DIR_REPORTS, 'watch')
+                print("Error: %s" % error)
+                continue
+            latency = time.time() - detected
+            metrics.add_time('watch_build', elapsed)
+            metrics.count('watch_builds')
+            metrics.sample('change_to_page', [latency])
+            path = metrics.save(DIR_REPORTS, 'watch')
+            print("%d files changed: site updated %.2fs after the change (%s)" % (len(paths), latency, path))
+    except KeyboardInterrupt:
+        print("Stopped")
+    finally:
+        watcher.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Watcher module.
+
+# File: watcher.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: wait for changes in the userdata directory
+"""
+
+import os
+import time
+
+try:
+    import inotify_simple # Optional (https://pypi.org/project/inotify_simple)
+except ImportError:
+    inotify_simple = None
+
+
+class Watcher:
+    """
+    Report changed files below a directory, with inotify if the
+    inotify_simple package is installed or else by polling file stats
+    every 'interval' seconds. Changes are debounced: wait() returns once
+    nothing else changed for 'debounce' seconds.
+    """
+
+    def __init__(self, path, debounce=1.0, interval=2.0):
+        self.path = path
+        self.debounce = debounce
+        self.interval = interval
+        self.inotify = None
+        self.wds = {}
+        self.snapshot = {}
+        if inotify_simple is not None:
+            self.backend = 'inotify'
+            self.inotify = inotify_simple.INotify()
+            for dirpath, dirnames, filenames in os.walk(path):
+                self.add_watch(dirpath)
+        else:
+            self.backend = 'polling'
+            self.snapshot = self.scan()
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def add_watch(self, dirpath):
+        flags = inotify_simple.flags
+        mask = flags.CLOSE_WRITE | flags.CREATE | flags.DELETE | flags.MOVED_FROM | flags.MOVED_TO
+        wd = self.inotify.add_watch(dirpath, mask)
+        self.wds[wd] = dirpath
+
+    def scan(self):
+        """Return path -> (size, mtime) of every file below the directory"""
+        snapshot = {}
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for filename in filenames:
+                filepath = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(filepath)
+                except FileNotFoundError:
+                    continue
+                snapshot[filepath] = (stat.st_size, stat.st_mtime)
+        return snapshot
+
+    def poll(self, timeout):
+        """Return the set of paths changed within 'timeout' seconds"""
+        if self.inotify is not None:
+            return self.poll_inotify(timeout)
+        return self.poll_stat(timeout)
+
+    def poll_inotify(self, timeout):
+        paths = set()
+        for event in self.inotify.read(timeout=int(timeout * 1000)):
+            try:
+                filepath = os.path.join(self.wds[event.wd], event.name)
+            except KeyError:
+                continue
+            if event.mask & inotify_simple.flags.ISDIR:
+                if event.mask & (inotify_simple.flags.CREATE | inotify_simple.flags.MOVED_TO):
+                    # New topic: watch it and report the files already in it
+                    self.add_watch(filepath)
+                    for filename in os.listdir(filepath):
+                        paths.add(os.path.join(filepath, filename))
+            paths.add(filepath)
+        return paths
+
+    def poll_stat(self, timeout):
+        time.sleep(timeout)
+        snapshot = self.scan()
+        paths = set()
+        for filepath in set(snapshot) | set(self.snapshot):
+            if snapshot.get(filepath) != self.snapshot.get(filepath):
+                paths.add(filepath)
+        self.snapshot = snapshot
+        return paths
+
+    def wait(self):
+        """
+        Block until something changes. Return a tuple (paths, detected),
+        where detected is the time the first change was seen.
+        """
+        paths = set()
+        while len(paths) == 0:
+            paths = self.poll(self.interval)
+        detected = time.time()
+        while True:
+            more = self.poll(self.debounce)
+            if len(more) == 0:
+                return paths, detected
+            paths.update(more)
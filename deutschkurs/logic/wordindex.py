@@ -0,0 +1,93 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Word index module.
+
+# File: wordindex.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: indexes over the words cache used by the listing pages
+"""
+
+
+KINDS = ['topic', 'pos', 'letter']
+
+
+def first_letter(word):
+    return word[0].upper()
+
+
+def dictionary_record(word, entry):
+    """Return only the fields of a word rendered in the dictionary pages"""
+    record = {}
+    record['word'] = word
+    record['title'] = entry['title']
+    record['article'] = entry.get('article', '')
+    record['part_of_speech'] = entry['part_of_speech']
+    record['topic'] = entry['topic']
+    return record
+
+
+class WordIndex:
+    """
+    Inverted indexes topic -> words, POS -> words and letter -> words.
+
+    Indexes are updated as words are added to or removed from the cache.
+    Changes since the last commit are kept in 'delta' as
+    (kind, term, word) -> True (added) / False (removed).
+    """
+
+    def __init__(self):
+        self.index = {}
+        for kind in KINDS:
+            self.index[kind] = {}
+        self.delta = {}
+
+    def add(self, kind, term, word):
+        try:
+            postings = self.index[kind][term]
+        except KeyError:
+            postings = self.index[kind][term] = set()
+        if word not in postings:
+            postings.add(word)
+            self.delta[(kind, term, word)] = True
+
+    def remove(self, kind, term, word):
+        try:
+            postings = self.index[kind][term]
+        except KeyError:
+            return
+        if word in postings:
+            postings.remove(word)
+            if len(postings) == 0:
+                del(self.index[kind][term])
+            self.delta[(kind, term, word)] = False
+
+    def add_word(self, word, entry):
+        self.add('letter', first_letter(word), word)
+        self.add('pos', entry['part_of_speech'], word)
+        for topic in entry['topic']:
+            self.add('topic', topic, word)
+
+    def remove_word(self, word, entry):
+        self.remove('letter', first_letter(word), word)
+        self.remove('pos', entry['part_of_speech'], word)
+        for topic in entry['topic']:
+            self.remove('topic', topic, word)
+
+    def rebuild(self, words):
+        for word in words:
+            self.add_word(word, words[word])
+
+    def words(self, kind, term):
+        return self.index[kind].get(term, set())
+
+    def terms(self, kind):
+        return sorted(self.index[kind].keys())
+
+    def counts(self, kind):
+        counts = {}
+        for term in self.index[kind]:
+            counts[term] = len(self.index[kind][term])
+        return counts
@@ -0,0 +1,189 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Word record module.
+
+# File: wordrecord.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: compact in-memory entries of the words cache
+"""
+
+import sys
+from collections.abc import MutableMapping
+
+# Placeholder of Duden fields kept in the store until used
+LAZY = object()
+
+
+class Symbols:
+    """Intern a small set of strings (POS labels, topics) as integer ids"""
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def id(self, name):
+        try:
+            return self.ids[name]
+        except KeyError:
+            n = self.ids[name] = len(self.names)
+            self.names.append(sys.intern(name))
+            return n
+
+    def name(self, n):
+        return self.names[n]
+
+
+POS = Symbols()
+TOPICS = Symbols()
+
+
+def topic_bits(topics):
+    bits = 0
+    for topic in topics:
+        bits |= 1 << TOPICS.id(topic)
+    return bits
+
+
+def topic_names(bits):
+    names = []
+    n = 0
+    while bits:
+        if bits & 1:
+            names.append(TOPICS.name(n))
+        bits >>= 1
+        n += 1
+    return sorted(names)
+
+
+class WordRecord(MutableMapping):
+    """
+    Entry of cache['words'] behaving as the dictionary it replaces.
+
+    The POS is an id of POS, the topics a bitset of TOPICS ids. Any other
+    field (the Duden export) is 'extra': it is stored apart and left in
+    the store ('source') when loaded, until it is first used. Note that
+    record['topic'] returns a new list: assign it back after changing it.
+    """
+
+    __slots__ = ['key', 'title', 'article', 'pos', 'topics', 'forms', 'extra', 'source']
+
+    FIELDS = ['title', 'article', 'part_of_speech', 'topic', 'forms']
+
+    def __init__(self, key=None, source=None):
+        self.key = key
+        self.title = None
+        self.article = None
+        self.pos = None
+        self.topics = 0
+        self.forms = None
+        self.extra = None
+        self.source = source
+
+    @classmethod
+    def from_dict(cls, key, entry, source=None):
+        """Build a record from an entry of the current schema (consumed)"""
+        record = cls(key, source)
+        record.title = entry.pop('title', None)
+        article = entry.pop('article', None)
+        if article is not None:
+            record.article = sys.intern(article)
+        pos = entry.pop('part_of_speech', None)
+        if pos is not None:
+            record.pos = POS.id(pos)
+        record.topics = topic_bits(entry.pop('topic', []))
+        record.forms = entry.pop('forms', None)
+        if len(entry) > 0:
+            record.extra = entry
+        return record
+
+    def to_dict(self):
+        return dict(self)
+
+    def core(self):
+        """Return the fields set by the analysis, without the extra ones"""
+        core = {}
+        for k in self.FIELDS:
+            try:
+                core[k] = self[k]
+            except KeyError:
+                pass
+        return core
+
+    def load(self):
+        """Return the extra fields, reading them from the store if needed"""
+        if self.extra is LAZY:
+            self.extra = self.source.get_extra(self.key) or {}
+        return self.extra
+
+    def unload(self):
+        """Drop the extra fields from memory once they are in the store"""
+        if self.source is not None and self.extra:
+            self.extra = LAZY
+
+    def __getitem__(self, k):
+        if k == 'title':
+            value = self.title
+        elif k == 'article':
+            value = self.article
+        elif k == 'part_of_speech':
+            value = None if self.pos is None else POS.name(self.pos)
+        elif k == 'topic':
+            return topic_names(self.topics)
+        elif k == 'forms':
+            value = self.forms
+        elif self.extra is not None:
+            return self.load()[k]
+        else:
+            value = None
+        if value is None:
+            raise KeyError(k)
+        return value
+
+    def __setitem__(self, k, value):
+        if k == 'title':
+            self.title = value
+        elif k == 'article':
+            self.article = sys.intern(value) if isinstance(value, str) else value
+        elif k == 'part_of_speech':
+            self.pos = POS.id(value)
+        elif k == 'topic':
+            self.topics = topic_bits(value)
+        elif k == 'forms':
+            self.forms = value
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.load()[k] = value
+
+    def __delitem__(self, k):
+        self[k]
+        if k == 'part_of_speech':
+            self.pos = None
+        elif k == 'topic':
+            self.topics = 0
+        elif k in self.FIELDS:
+            setattr(self, k, None)
+        else:
+            del(self.load()[k])
+
+    def __iter__(self):
+        if self.title is not None:
+            yield 'title'
+        if self.article is not None:
+            yield 'article'
+        if self.pos is not None:
+            yield 'part_of_speech'
+        yield 'topic'
+        if self.forms is not None:
+            yield 'forms'
+        if self.extra is not None:
+            yield from list(self.load())
+
+    def __len__(self):
+        return sum(1 for k in self)
+
+    def __repr__(self):
+        return "WordRecord(%r)" % self.to_dict()
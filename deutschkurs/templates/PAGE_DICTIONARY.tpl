@@ -4,7 +4,7 @@
 <div class="uk-flex uk-flex-center">
     <ul class="uk-pagination" uk-margin>
     % for letter in var['letters']:
-        <li class="uk-link-heading"><a href="dictionary-${letter}.html">${letter}</a></li>
+        <li class="uk-link-heading"><a href="dictionary-${letter}-1.html">${letter}</a></li>
     % endfor
     </ul>
 </div>
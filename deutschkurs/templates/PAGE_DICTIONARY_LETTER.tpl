@@ -4,11 +4,16 @@
 <div class="uk-flex uk-flex-center">
     <ul class="uk-pagination" uk-margin>
     % for letter in var['letters']:
-        <li class="uk-link-heading"><a href="dictionary-${letter}.html">${letter}</a></li>
+        <li class="uk-link-heading"><a href="dictionary-${letter}-1.html">${letter}</a></li>
     % endfor
     </ul>
 </div>
 
+<div class="uk-flex uk-flex-center">
+    <ul class="uk-pagination" uk-margin>
+        ${var['pagination']}
+    </ul>
+</div>
 
 <div class="uk-flex uk-flex-center">
     <ul class="js-filter uk-child-width-1-1 uk-width-1-1" uk-grid>
@@ -21,24 +26,21 @@
                         <div class="uk-card uk-card-body uk-padding-small uk-margin-remove uk-width-1-4"><span class="uk-text-bold">Topic</span></div>
         </div>
     </li>
-    % for word in var['dictionary'][letter_active]:
+    % for record in var['records']:
         <li class="uk-margin-remove" data-letter="${letter}" data-size="large">
             <div class="uk-card uk-card-body uk-padding-remove uk-margin-remove uk-card-hover uk-text-left" uk-grid>
                 <%
-                    try:
-                        if var['cache']['words'][word]['article'] not in ['das', 'der', 'dia']:
-                            article = ''
-                        else:
-                            article = var['cache']['words'][word]['article']
-                    except:
+                    if record['article'] not in ['das', 'der', 'dia']:
                         article = ''
+                    else:
+                        article = record['article']
                 %>
 
                 <div class="uk-card uk-card-body uk-padding-small uk-margin-remove uk-card-hover uk-width-1-4"><span class="uk-text-bold">${article}</span></div>
-                <div class="uk-card uk-card-body uk-padding-small uk-margin-remove uk-card-hover uk-width-1-4"><span class="uk-text-bold">${var['cache']['words'][word]['title']}</span></div>
-                <div class="uk-card uk-card-body uk-padding-small uk-margin-remove uk-card-hover uk-width-1-4"><span class="uk-text-primary">${var['cache']['words'][word]['part_of_speech']}</span></div>
+                <div class="uk-card uk-card-body uk-padding-small uk-margin-remove uk-card-hover uk-width-1-4"><span class="uk-text-bold">${record['title']}</span></div>
+                <div class="uk-card uk-card-body uk-padding-small uk-margin-remove uk-card-hover uk-width-1-4"><span class="uk-text-primary">${record['part_of_speech']}</span></div>
                 <%
-                    topics = ' '.join(var['cache']['words'][word]['topic'])
+                    topics = ' '.join(record['topic'])
                 %>
                 <div class="uk-card uk-card-body uk-padding-small uk-margin-remove uk-card-hover uk-width-1-4"><span class="uk-text-danger">${topics}</span></div>
             </div>
@@ -0,0 +1,50 @@
+= ${var['title']}
+
+++++
+    <!-- PAGE_PERFORMANCE.tpl :: START -->
+    <% report = var['report'] %>
+    <div class="uk-grid-small" uk-grid>
+        <div class="uk-width-expand uk-text-bold" uk-leader>Build started</div>
+        <div>${report['started']}</div>
+    </div>
+    <div class="uk-grid-small" uk-grid>
+        <div class="uk-width-expand uk-text-bold" uk-leader>Elapsed (s)</div>
+        <div>${'%.2f' % report['elapsed']}</div>
+    </div>
+    <!-- Timers -->
+    <div class="uk-grid-small" uk-grid>
+        <div class="uk-width-expand uk-text-bold uk-text-primary">Phases (s)</div>
+    </div>
+% for name in sorted(report['timers']):
+    <div class="uk-grid-small" uk-grid>
+        <div class="uk-width-1-6@m"></div>
+        <div class="uk-width-expand uk-text-bold" uk-leader>${name}</div>
+        <div>${'%.3f' % report['timers'][name]}</div>
+    </div>
+% endfor
+    <!-- Counters -->
+    <div class="uk-grid-small" uk-grid>
+        <div class="uk-width-expand uk-text-bold uk-text-primary">Counters</div>
+    </div>
+% for name in sorted(report['counters']):
+    <div class="uk-grid-small" uk-grid>
+        <div class="uk-width-1-6@m"></div>
+        <div class="uk-width-expand uk-text-bold" uk-leader>${name}</div>
+        <div>${report['counters'][name]}</div>
+    </div>
+% endfor
+    <!-- Samples -->
+% for name in sorted(report['samples']):
+    <div class="uk-grid-small" uk-grid>
+        <div class="uk-width-expand uk-text-bold uk-text-primary">${name} (s)</div>
+    </div>
+    % for key in sorted(report['samples'][name]):
+    <div class="uk-grid-small" uk-grid>
+        <div class="uk-width-1-6@m"></div>
+        <div class="uk-width-expand uk-text-bold" uk-leader>${key}</div>
+        <div>${report['samples'][name][key] if key == 'count' else '%.3f' % report['samples'][name][key]}</div>
+    </div>
+    % endfor
+% endfor
+    <!-- PAGE_PERFORMANCE.tpl :: END -->
+++++
@@ -1,4 +1,4 @@
 <li class="uk-active">
-    <span uk-tooltip="Page ${var['page_num']}: ${var['page_start']}-${var['page_end']}/${var['page_count_docs']}}">${var['page_num']}</span>
+    <span uk-tooltip="Page ${var['page_num']}: ${var['page_start']}-${var['page_end']}/${var['page_count_docs']}">${var['page_num']}</span>
 </li>
 
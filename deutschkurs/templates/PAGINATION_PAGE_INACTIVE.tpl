@@ -1 +1 @@
-<li uk-tooltip="Page ${var['page_start']}: ${var['page_end']}-${var['page_num']}/${var['page_count_docs']}"><a href="${var['page_link']}"><span>${var['page_num']}</span></a></li>
+<li uk-tooltip="Page ${var['page_num']}: ${var['page_start']}-${var['page_end']}/${var['page_count_docs']}"><a href="${var['page_link']}"><span>${var['page_num']}</span></a></li>
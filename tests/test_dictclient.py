@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+DICT client tests.
+
+# File: test_dictclient.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: DictConnection and PersonalDictionary against a small
+# local fake dictd server. kb4it must be installed. Usage:
+#   python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import socket
+import shutil
+import tempfile
+import threading
+import unittest
+import socketserver
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'deutschkurs', 'logic'))
+
+import mydict
+from dictclient import DictConnection, DictPool, DictError, format_definitions, PIPELINE
+
+DATABASE = 'fd-deu-eng'
+DESCRIPTION = 'German-English FreeDict Dictionary'
+DEFINITIONS = {
+    'Haus': [['Haus /haʊs/', 'house', '.dotted line', '..two dots']],
+    'Bank': [['Bank', 'bench'], ['Bank', 'bank (finance)']],
+}
+
+# Fake 'dict' client: prints a definition of Haus, else fails as dict does
+DICT_CLIENT = """#!/bin/sh
+if [ "$4" = "Haus" ]; then
+    echo "1 definition found"
+    echo "From $3: Haus -> house"
+else
+    echo "No definitions found for \\"$4\\"" >&2
+    exit 21
+fi
+"""
+
+
+class FakeDictd(socketserver.StreamRequestHandler):
+    """
+    Answer CLIENT, DEFINE and QUIT as dictd does. Responses are held
+    until 'hold' DEFINE commands have been received on the connection,
+    which only a client pipelining its commands gets past.
+    """
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.wfile.write(b"220 fake dictd <auth.mime> <1.1@localhost>\r\n")
+        held = []
+        for raw in self.rfile:
+            line = raw.decode('utf-8').strip()
+            command = line.split(' ', 1)[0].upper()
+            if command == 'CLIENT':
+                self.wfile.write(b"250 ok\r\n")
+            elif command == 'QUIT':
+                self.wfile.write(b"221 bye\r\n")
+                return
+            elif command == 'DEFINE':
+                with server.lock:
+                    server.commands.append(line)
+                held.append(self.define(line))
+                if len(held) >= server.hold:
+                    self.wfile.write(''.join(held).encode('utf-8'))
+                    held = []
+                    server.hold = 1
+            else:
+                self.wfile.write(b"500 unknown command\r\n")
+
+    def define(self, line):
+        command, database, word = line.split(' ', 2)
+        database = database.strip('"')
+        word = word.strip('"')
+        if database != DATABASE:
+            return "550 invalid database\r\n"
+        if word not in DEFINITIONS:
+            return "552 no match [d/m/c = 0/0/0; 0.000r 0.000u 0.000s]\r\n"
+        response = ["150 %d definitions retrieved\r\n" % len(DEFINITIONS[word])]
+        for text in DEFINITIONS[word]:
+            response.append('151 "%s" %s "%s"\r\n' % (word, DATABASE, DESCRIPTION))
+            for textline in text:
+                if textline.startswith('.'):
+                    textline = '.' + textline
+                response.append(textline + "\r\n")
+            response.append(".\r\n")
+        response.append("250 ok [d/m/c = 1/0/20; 0.000r 0.000u 0.000s]\r\n")
+        return ''.join(response)
+
+
+def start_server(hold=1):
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeDictd)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.commands = []
+    server.hold = hold
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def closed_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class TestDictConnection(unittest.TestCase):
+    def setUp(self):
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def connect(self, hold=1):
+        self.server = start_server(hold)
+        return DictConnection('127.0.0.1', self.server.server_address[1], timeout=5)
+
+    def test_pipelined_define(self):
+        words = ['Haus', 'Xyz', 'Bank']
+        conn = self.connect(hold=len(words))
+        try:
+            results = conn.define_many(words, DATABASE)
+        finally:
+            conn.close()
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0], [(DATABASE, DESCRIPTION, ['Haus /haʊs/', 'house', '.dotted line', '..two dots'])])
+        self.assertEqual(results[1], [])
+        self.assertEqual([text for database, description, text in results[2]], DEFINITIONS['Bank'])
+        self.assertEqual(self.server.commands, ['DEFINE "%s" "%s"' % (DATABASE, word) for word in words])
+
+    def test_more_words_than_pipeline(self):
+        words = ['Haus', 'Xyz'] * PIPELINE + ['Bank']
+        conn = self.connect(hold=PIPELINE)
+        try:
+            results = conn.define_many(words, DATABASE)
+        finally:
+            conn.close()
+        self.assertEqual(len(results), len(words))
+        self.assertEqual(results[-2], [])
+        self.assertEqual(len(results[-1]), 2)
+        self.assertEqual(results[:-1:2], [results[0]] * PIPELINE)
+
+    def test_invalid_database(self):
+        conn = self.connect()
+        try:
+            with self.assertRaises(DictError):
+                conn.define_many(['Haus'], 'nope')
+        finally:
+            conn.close()
+
+    def test_control_characters_rejected(self):
+        conn = self.connect()
+        try:
+            # Would send a second DEFINE and shift every later response
+            with self.assertRaises(DictError):
+                conn.define_many(['Haus', 'a\r\nDEFINE * b', 'Bank'], DATABASE)
+            with self.assertRaises(DictError):
+                conn.define_many(['Haus'], DATABASE + '\n')
+            self.assertEqual(self.server.commands, [])
+            # Nothing was sent: the connection is still usable
+            results = conn.define_many(['Haus', 'Bank'], DATABASE)
+        finally:
+            conn.close()
+        self.assertEqual(results[0][0][2][1], 'house')
+        self.assertEqual(len(results[1]), 2)
+
+    def test_pool_reuses_connection(self):
+        self.server = start_server()
+        pool = DictPool('127.0.0.1', self.server.server_address[1], timeout=5)
+        try:
+            pool.define_many(['Haus'], DATABASE)
+            pool.define_many(['Bank', 'Xyz'], DATABASE)
+        finally:
+            pool.close()
+        self.assertEqual(self.server.connections, 1)
+
+    def test_pool_closed_port(self):
+        pool = DictPool('127.0.0.1', closed_port(), timeout=5)
+        with self.assertRaises(OSError):
+            pool.define_many(['Haus'], DATABASE)
+
+    def test_format_definitions(self):
+        self.assertEqual(format_definitions('Xyz', []), b'No definitions found for "Xyz"\n')
+        text = format_definitions('Haus', [(DATABASE, DESCRIPTION, ['house'])]).decode('utf-8')
+        self.assertTrue(text.startswith("1 definition found\n"))
+        self.assertIn("From %s [%s]:" % (DESCRIPTION, DATABASE), text)
+        self.assertIn("  house", text)
+
+
+class TestPersonalDictionary(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='test-dict-')
+        self.cwd = os.getcwd()
+        self.path = os.environ['PATH']
+        self.saved = (mydict.DIR_DICT, mydict.FILE_DICT_DB)
+        os.chdir(self.directory)
+        mydict.DIR_DICT = os.path.join(self.directory, 'dict')
+        mydict.FILE_DICT_DB = os.path.join(self.directory, 'dict', 'dict.db')
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        mydict.DIR_DICT, mydict.FILE_DICT_DB = self.saved
+        os.environ['PATH'] = self.path
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_lookup_many_through_dictd(self):
+        self.server = start_server(hold=2)
+        pd = mydict.PersonalDictionary(host='127.0.0.1', port=self.server.server_address[1])
+        definitions = pd.lookup_many(['Haus', 'Xyz', 'Haus'], DATABASE)
+        self.assertIn(b"  .dotted line", definitions['Haus'])
+        self.assertEqual(definitions['Xyz'], b'No definitions found for "Xyz"\n')
+        self.assertEqual(len(self.server.commands), 2)
+        # Known words are not asked again
+        pd.lookup('Haus', DATABASE)
+        self.assertEqual(len(self.server.commands), 2)
+
+    def test_lookup_many_skips_control_characters(self):
+        self.server = start_server(hold=2)
+        pd = mydict.PersonalDictionary(host='127.0.0.1', port=self.server.server_address[1])
+        injected = 'a\r\nDEFINE * b'
+        definitions = pd.lookup_many(['Haus', injected, 'Bank'], DATABASE)
+        self.assertIn(b"house", definitions['Haus'])
+        self.assertIn(b"bank (finance)", definitions['Bank'])
+        self.assertIsNone(definitions[injected])
+        self.assertEqual(len(self.server.commands), 2)
+        defs, nodefs = pd.missing()
+        self.assertEqual(sorted(defs), [(DATABASE, 'bank'), (DATABASE, 'haus')])
+
+    def test_fallback_to_dict_client(self):
+        bindir = os.path.join(self.directory, 'bin')
+        os.makedirs(bindir)
+        client = os.path.join(bindir, 'dict')
+        with open(client, 'w') as fout:
+            fout.write(DICT_CLIENT)
+        os.chmod(client, 0o755)
+        os.environ['PATH'] = bindir + os.pathsep + self.path
+
+        pd = mydict.PersonalDictionary(host='127.0.0.1', port=closed_port())
+        definitions = pd.lookup_many(['Haus', 'Xyz'], DATABASE)
+        self.assertEqual(definitions['Haus'], ("1 definition found\nFrom %s: Haus -> house\n" % DATABASE).encode('utf-8'))
+        self.assertEqual(definitions['Xyz'], b'No definitions found for "Xyz"\n')
+        defs, nodefs = pd.missing()
+        self.assertEqual(list(nodefs), [(DATABASE, 'xyz')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Duden lookup tests.
+
+# File: test_dudenlookup.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: DudenResolver against a local stub HTTP server. Usage:
+#   python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import unittest
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'deutschkurs', 'logic'))
+
+from dudenlookup import DudenResolver, FOUND, MISSING, FAILED, CACHED
+
+
+class StubDuden(BaseHTTPRequestHandler):
+    """
+    GET /<word> answers 200 with an export for known words, 404 for
+    unknown ones and 503 while a word still has failures left.
+    """
+
+    def do_GET(self):
+        server = self.server
+        word = urllib.parse.unquote(self.path[1:])
+        with server.lock:
+            server.requests[word] = server.requests.get(word, 0) + 1
+            failing = server.failures.get(word, 0) > 0
+            if failing:
+                server.failures[word] -= 1
+        if failing:
+            self.send_error(503)
+        elif word in server.known:
+            body = json.dumps({'title': "%s, das" % word, 'name': word, 'article': 'das'}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDudenResolver(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubDuden)
+        self.server.lock = threading.Lock()
+        self.server.requests = {}
+        self.server.failures = {}
+        self.server.known = set(['Haus', 'Kind', 'Garten'])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = "http://127.0.0.1:%d/" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def fetch(self, word):
+        try:
+            with urllib.request.urlopen(self.url + urllib.parse.quote(word), timeout=5) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as error:
+            if error.code == 404:
+                return None
+            raise
+
+    def resolver(self, **kwargs):
+        kwargs.setdefault('rate', 0)
+        kwargs.setdefault('backoff', 0)
+        return DudenResolver(self.fetch, **kwargs)
+
+    def test_found_and_missing(self):
+        results = self.resolver().resolve({'haus': 'Haus', 'xyz': 'Xyz'})
+        self.assertEqual(results['haus'][0], FOUND)
+        self.assertEqual(results['haus'][1]['article'], 'das')
+        self.assertEqual(results['xyz'], (MISSING, None))
+
+    def test_deduplication(self):
+        words = {'haus': 'Haus', 'häuser': 'Haus', 'hause': 'Haus', 'kind': 'Kind'}
+        results = self.resolver(workers=4).resolve(words)
+        self.assertEqual(sorted(results), sorted(words))
+        self.assertEqual(self.server.requests, {'Haus': 1, 'Kind': 1})
+        self.assertEqual(results['häuser'], results['haus'])
+
+    def test_retry_with_backoff(self):
+        self.server.failures['Garten'] = 2
+        resolver = self.resolver(retries=3, backoff=0.05)
+        start = time.monotonic()
+        results = resolver.resolve({'garten': 'Garten'})
+        elapsed = time.monotonic() - start
+        self.assertEqual(results['garten'][0], FOUND)
+        self.assertEqual(self.server.requests['Garten'], 3)
+        # Waits of 0.05 and 0.1 seconds before the second and third attempts
+        self.assertGreaterEqual(elapsed, 0.15)
+        self.assertEqual(len(resolver.latencies), 3)
+
+    def test_retries_exhausted(self):
+        self.server.failures['Kind'] = 10
+        results = self.resolver(retries=2).resolve({'kind': 'Kind'})
+        self.assertEqual(results['kind'][0], FAILED)
+        self.assertIsInstance(results['kind'][1], urllib.error.HTTPError)
+        self.assertEqual(self.server.requests['Kind'], 3)
+
+    def test_negative_cache_ttl(self):
+        now = time.time()
+        misses = {'xyz': now - 60, 'abc': now - 7200}
+        results = self.resolver(misses=misses, ttl=3600).resolve({'xyz': 'Xyz', 'abc': 'Abc'})
+        self.assertEqual(results['xyz'], (CACHED, None))
+        self.assertEqual(results['abc'], (MISSING, None))
+        self.assertEqual(self.server.requests, {'Abc': 1})
+
+    def test_offline(self):
+        misses = {'xyz': time.time()}
+        resolver = self.resolver(offline=True, misses=misses, ttl=3600)
+        results = resolver.resolve({'haus': 'Haus', 'xyz': 'Xyz'})
+        self.assertEqual(results, {'xyz': (CACHED, None)})
+        self.assertEqual(self.server.requests, {})
+        self.assertEqual(resolver.latencies, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
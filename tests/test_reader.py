@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Reader tests.
+
+# File: test_reader.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: read_chunks over generated 50 MB files, with and without
+# paragraph breaks. nltk must be installed; cuts between sentences are
+# only tested if its punkt tokenizer data is installed too. Usage:
+#   python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import random
+import shutil
+import hashlib
+import tempfile
+import unittest
+import tracemalloc
+from unittest import mock
+
+DIR_TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DIR_TESTS, '..', 'deutschkurs', 'logic'))
+sys.path.insert(0, os.path.join(DIR_TESTS, '..', 'benchmarks'))
+
+import stubs
+import reader
+from reader import read_chunks, CHUNK_SIZE
+
+SIZE = 50 * 1024 * 1024
+# Peak memory allowed while reading, whatever the size of the file
+MAX_PEAK = 16 * 1024 * 1024
+
+
+def has_punkt():
+    """sent_tokenize needs the punkt data (punkt_tab since nltk 3.9)"""
+    try:
+        reader.sent_tokenize('Guten Tag. Wie geht es?', language='german')
+    except LookupError:
+        return False
+    return True
+
+
+def make_text(path, size, paragraphs, seed=0):
+    """
+    Write about 'size' bytes of German-like sentences to path, with a
+    blank line every few sentences if 'paragraphs'. Return its sha256.
+    """
+    rnd = random.Random(seed)
+    vocabulary = stubs.make_vocabulary(2000, seed)
+    sentences = []
+    for n in range(5000):
+        sentences.append(stubs.make_sentence(rnd, vocabulary, rnd.randint(5, 15)))
+        if paragraphs and rnd.random() < 0.2:
+            sentences[-1] += '\n\n'
+        else:
+            sentences[-1] += ' '
+    block = ''.join(sentences)
+    digest = hashlib.sha256()
+    written = 0
+    with open(path, 'w', encoding='utf-8', newline='\n') as fout:
+        while written < size:
+            fout.write(block)
+            digest.update(block.encode('utf-8'))
+            written += len(block.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class TestReadChunks(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='test-reader-')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def check_large_file(self, paragraphs):
+        path = os.path.join(self.directory, 'large.txt')
+        expected = make_text(path, SIZE, paragraphs)
+
+        # Chunks are consumed and dropped, as analyze_userdata does
+        digest = hashlib.sha256()
+        longest = 0
+        count = 0
+        tracemalloc.start()
+        try:
+            for chunk in read_chunks(path):
+                digest.update(chunk.encode('utf-8'))
+                longest = max(longest, len(chunk))
+                count += 1
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(digest.hexdigest(), expected)
+        self.assertGreater(count, SIZE // (2 * CHUNK_SIZE))
+        self.assertLessEqual(longest, 2 * CHUNK_SIZE)
+        self.assertLess(peak, MAX_PEAK)
+
+        with open(path, 'r', encoding='utf-8') as fin:
+            text = fin.read()
+        self.assertTrue(''.join(read_chunks(path)) == text)
+
+    def test_large_file_with_paragraphs(self):
+        self.check_large_file(paragraphs=True)
+
+    def test_large_file_without_paragraphs(self):
+        self.check_large_file(paragraphs=False)
+
+    @unittest.skipUnless(has_punkt(), "punkt tokenizer data not installed")
+    def test_cut_between_sentences(self):
+        path = os.path.join(self.directory, 'sentences.txt')
+        make_text(path, 50000, paragraphs=False)
+        chunks = list(read_chunks(path, chunk_size=1000))
+        for chunk in chunks[:-1]:
+            self.assertIn(chunk.rstrip()[-1], '.!?')
+
+    def test_cut_without_punkt(self):
+        path = os.path.join(self.directory, 'sentences.txt')
+        make_text(path, 50000, paragraphs=False)
+        with open(path, 'r', encoding='utf-8') as fin:
+            text = fin.read()
+        with mock.patch('reader.sent_tokenize', side_effect=LookupError('punkt_tab')):
+            chunks = list(read_chunks(path, chunk_size=1000))
+        self.assertEqual(''.join(chunks), text)
+        for chunk in chunks[:-1]:
+            self.assertTrue(chunk[-1].isspace())
+            self.assertLessEqual(len(chunk), 2 * 1000)
+
+    def test_no_whitespace(self):
+        path = os.path.join(self.directory, 'word.txt')
+        text = 'x' * (5 * 1000 + 7)
+        with open(path, 'w') as fout:
+            fout.write(text)
+        chunks = list(read_chunks(path, chunk_size=1000))
+        self.assertEqual(''.join(chunks), text)
+        self.assertLessEqual(max(len(chunk) for chunk in chunks), 2 * 1000)
+
+    def test_small_and_empty_files(self):
+        path = os.path.join(self.directory, 'small.txt')
+        with open(path, 'w') as fout:
+            fout.write('Liebe Eltern.\n\nVielen Dank!')
+        self.assertEqual(list(read_chunks(path)), ['Liebe Eltern.\n\nVielen Dank!'])
+        with open(path, 'w') as fout:
+            pass
+        self.assertEqual(list(read_chunks(path)), [''])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Theme Duden tests.
+
+# File: test_theme_duden.py
+# Author: Tomás Vírseda
+# License: GPL v3
+# Description: Theme.resolve_nouns with a fake Duden lookup and the
+# negative cache. kb4it, nltk and duden must be installed. Usage:
+#   python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'deutschkurs', 'logic'))
+
+from theme import Theme
+from cachestore import CacheStore
+from metrics import Metrics
+from wordrecord import WordRecord
+
+DAY = 86400
+
+
+class App:
+    def get_theme_properties(self):
+        return {'duden_rate': 0, 'duden_backoff': 0, 'duden_negative_ttl': 30}
+
+
+class TestResolveNouns(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='test-theme-')
+        self.theme = Theme()
+        self.theme.log = logging.getLogger('test')
+        self.theme.srvapp = App()
+        self.theme.metrics = Metrics()
+        self.theme.store = CacheStore(os.path.join(self.directory, 'cache.db'))
+        self.theme.store.open()
+        self.theme.cache = self.theme.store.load()
+        self.known = {}
+        self.lookups = []
+        self.theme.get_duden_dict = self.fetch
+        for key, text in [('haus', 'Haus'), ('xyz', 'Xyz')]:
+            self.theme.cache['words'][key] = WordRecord(key)
+            self.theme.cache['words'][key]['title'] = text
+            self.theme.cache['words'][key]['part_of_speech'] = 'Noun'
+            self.theme.store.touch('words', key)
+
+    def tearDown(self):
+        self.theme.store.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def fetch(self, word):
+        self.lookups.append(word)
+        return self.known.get(word)
+
+    def test_expired_miss_is_looked_up_again(self):
+        cache = self.theme.cache
+        cache['duden_misses']['xyz'] = time.time() - 31 * DAY
+        self.known['Xyz'] = {'title': 'Xyz, das', 'article': 'das'}
+        self.assertEqual(self.theme.resolve_nouns(), ['xyz'])
+        self.assertEqual(self.lookups, ['Xyz'])
+        self.assertEqual(cache['words']['xyz']['article'], 'das')
+        self.assertEqual(cache['duden_misses'], {})
+        self.assertEqual(cache['duden_pending'], {})
+
+    def test_recent_miss_is_not_looked_up(self):
+        cache = self.theme.cache
+        cache['duden_misses']['xyz'] = time.time() - DAY
+        # Queued again (eg.: retracted and found again) while still a miss
+        cache['duden_pending']['xyz'] = 'Xyz'
+        self.theme.resolve_nouns()
+        self.assertEqual(self.lookups, [])
+        self.assertEqual(cache['duden_pending'], {})
+        self.assertIn('xyz', cache['duden_misses'])
+        self.assertEqual(self.theme.metrics.counters['duden_negative_hits'], 1)
+
+    def test_misses_of_retracted_words_are_dropped(self):
+        cache = self.theme.cache
+        cache['duden_misses']['gone'] = time.time()
+        self.assertEqual(self.theme.resolve_nouns(), [])
+        self.assertEqual(cache['duden_misses'], {})
+
+    def test_miss_recorded_and_kept(self):
+        cache = self.theme.cache
+        cache['duden_pending']['xyz'] = 'Xyz'
+        self.theme.resolve_nouns()
+        self.assertIn('xyz', cache['duden_misses'])
+        self.assertEqual(cache['duden_pending'], {})
+        # Not asked again while the miss is recent
+        self.theme.resolve_nouns()
+        self.assertEqual(self.lookups, ['Xyz'])
+
+
+if __name__ == '__main__':
+    unittest.main()